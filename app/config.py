@@ -0,0 +1,106 @@
+import json
+import os
+from dotenv import load_dotenv
+
+
+# Load settings from environment
+load_dotenv()
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Read a boolean flag from the environment"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float from the environment"""
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer from the environment"""
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+# Courses, their agent nodes and prompts
+COURSES_FILE = os.getenv("COURSES_FILE", os.path.join(DATA_DIR, "courses.json"))
+
+# Local pre-classifier in front of the LLM classifier
+LOCAL_CLASSIFIER_ENABLED = _env_bool("LOCAL_CLASSIFIER_ENABLED", True)
+LOCAL_CLASSIFIER_THRESHOLD = _env_float("LOCAL_CLASSIFIER_THRESHOLD", 0.9)
+LOCAL_CLASSIFIER_KEYWORDS = os.getenv(
+    "LOCAL_CLASSIFIER_KEYWORDS", os.path.join(DATA_DIR, "classifier_keywords.json")
+)
+LOCAL_CLASSIFIER_TRAINING = os.getenv(
+    "LOCAL_CLASSIFIER_TRAINING", os.path.join(DATA_DIR, "classifier_training.jsonl")
+)
+
+# Route short follow-ups ("explain that again") to the session's previous course without classifying
+SESSION_STICKY_ROUTING = _env_bool("SESSION_STICKY_ROUTING", False)
+STICKY_MAX_WORDS = _env_int("STICKY_MAX_WORDS", 12)
+
+# Draft the likely agent's answer in parallel with the LLM classifier (costs tokens on misses)
+SPECULATIVE_EXECUTION = _env_bool("SPECULATIVE_EXECUTION", False)
+
+# Classification cache in front of the LLM classifier
+CLASSIFICATION_CACHE_SIZE = _env_int("CLASSIFICATION_CACHE_SIZE", 10000)
+CLASSIFICATION_CACHE_TTL_SECONDS = _env_float("CLASSIFICATION_CACHE_TTL_SECONDS", 7 * 24 * 3600)
+CLASSIFICATION_CACHE_FILE = os.getenv("CLASSIFICATION_CACHE_FILE") or None
+
+# Cache of specialist answers for context-free questions, keyed by content words (opt-in)
+RESPONSE_CACHE_ENABLED = _env_bool("RESPONSE_CACHE_ENABLED", False)
+RESPONSE_CACHE_SIZE = _env_int("RESPONSE_CACHE_SIZE", 500)
+
+# Session memory
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+SESSION_TTL_HOURS = _env_int("SESSION_TTL_HOURS", 24)
+MAX_SESSIONS = _env_int("MAX_SESSIONS", 1000)
+MAX_SESSION_MESSAGES = _env_int("MAX_SESSION_MESSAGES", 50)
+SESSION_SHARDS = _env_int("SESSION_SHARDS", 16)
+SESSION_SWEEP_INTERVAL_SECONDS = _env_float("SESSION_SWEEP_INTERVAL_SECONDS", 60)
+# Warm restarts for the in-memory store: sessions are snapshotted periodically and on shutdown
+SESSION_SNAPSHOT_FILE = os.getenv("SESSION_SNAPSHOT_FILE") or None
+SESSION_SNAPSHOT_INTERVAL_SECONDS = _env_float("SESSION_SNAPSHOT_INTERVAL_SECONDS", 300)
+
+# Token budget for conversation history in agent prompts, optionally per course
+CONTEXT_TOKEN_BUDGET = _env_int("CONTEXT_TOKEN_BUDGET", 2000)
+CONTEXT_TOKEN_BUDGETS = json.loads(os.getenv("CONTEXT_TOKEN_BUDGETS") or "{}")
+# Share of the budget kept when the history window overflows and restarts; the window
+# then grows turn by turn with a stable prefix that provider prompt caching can reuse
+CONTEXT_REFILL_FRACTION = _env_float("CONTEXT_REFILL_FRACTION", 0.5)
+
+# Rolling conversation summarization
+SUMMARY_ENABLED = _env_bool("SUMMARY_ENABLED", True)
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gemini-2.5-flash-lite")
+SUMMARY_TRIGGER_MESSAGES = _env_int("SUMMARY_TRIGGER_MESSAGES", 20)
+SUMMARY_KEEP_RECENT = _env_int("SUMMARY_KEEP_RECENT", 10)
+
+# Batch chat endpoint
+BATCH_CONCURRENCY = _env_int("BATCH_CONCURRENCY", 8)
+
+# Shared LLM gateway: concurrency limits, rate limiting and load shedding
+LLM_MAX_CONCURRENCY = _env_int("LLM_MAX_CONCURRENCY", 32)
+LLM_NODE_CONCURRENCY = json.loads(os.getenv("LLM_NODE_CONCURRENCY") or "{}")
+LLM_RATE_PER_SECOND = _env_float("LLM_RATE_PER_SECOND", 0)
+LLM_RATE_BURST = _env_int("LLM_RATE_BURST", 20)
+LLM_MAX_QUEUE = _env_int("LLM_MAX_QUEUE", 256)
+LLM_MAX_RATE_WAIT_SECONDS = _env_float("LLM_MAX_RATE_WAIT_SECONDS", 5)
+LLM_CALL_POLICIES = json.loads(os.getenv("LLM_CALL_POLICIES") or "{}")
+LLM_HTTP_MAX_CONNECTIONS = _env_int("LLM_HTTP_MAX_CONNECTIONS", 64)
+
+# Per-million-token prices used to estimate agent answer cost in /metrics (gemini-2.5-flash list prices)
+LLM_PRICE_INPUT_PER_MTOK = _env_float("LLM_PRICE_INPUT_PER_MTOK", 0.30)
+LLM_PRICE_CACHED_PER_MTOK = _env_float("LLM_PRICE_CACHED_PER_MTOK", 0.075)
+LLM_PRICE_OUTPUT_PER_MTOK = _env_float("LLM_PRICE_OUTPUT_PER_MTOK", 2.50)
+
+# Application logging
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
@@ -1,10 +1,15 @@
 from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
 from ..models.schemas import (
-    ChatRequest, ChatResponse, HealthResponse, ErrorResponse,
+    ChatRequest, ChatResponse, BatchChatRequest, BatchChatResponse, HealthResponse, ErrorResponse,
     SessionStatsResponse, SessionListResponse, ConversationHistoryResponse
 )
 from ..services.workflow_service import WorkflowService
+from ..services.llm_gateway import GatewayRejectedError
+from ..services import metrics
 from ..views.response_formatter import ResponseFormatter
+from typing import Optional, Union
+import hashlib
 import uuid
 
 
@@ -15,6 +20,37 @@ class ChatController:
         self.workflow_service = WorkflowService()
         self.response_formatter = ResponseFormatter()
 
+    def startup(self) -> None:
+        """Start background tasks on application startup"""
+        self.workflow_service.startup()
+
+    def shutdown(self) -> None:
+        """Persist state on application shutdown"""
+        self.workflow_service.shutdown()
+
+    @staticmethod
+    def _overloaded(error: GatewayRejectedError) -> HTTPException:
+        """Map a shed or timed-out model call to a 429/503/504 with Retry-After"""
+        return HTTPException(
+            status_code=error.status_code,
+            detail=str(error),
+            headers={"Retry-After": str(error.retry_after_seconds)}
+        )
+
+    @staticmethod
+    def _etag(version: str, *query) -> str:
+        """Strong ETag for one page of a session's history"""
+        digest = hashlib.sha1("|".join(map(str, (version, *query))).encode("utf-8")).hexdigest()
+        return f'"{digest[:20]}"'
+
+    @staticmethod
+    def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+        """Whether an If-None-Match header lists the current ETag (weak comparison, as RFC 9110 requires)"""
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
     async def process_chat_message(self, request: ChatRequest) -> ChatResponse:
         """Process a chat message through the workflow"""
         try:
@@ -22,17 +58,134 @@ class ChatController:
             session_id = request.session_id or str(uuid.uuid4())
             
             # Process message through workflow with session ID
-            result = self.workflow_service.process_message(request.message, session_id)
+            result = await self.workflow_service.aprocess_message(request.message, session_id)
             
             # Format and return response
             return self.response_formatter.format_chat_response(result, session_id)
             
+        except GatewayRejectedError as e:
+            raise self._overloaded(e)
         except Exception as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Error processing message: {str(e)}"
             )
 
+    async def process_chat_batch(self, request: BatchChatRequest) -> BatchChatResponse:
+        """Process several chat messages with one classification call and concurrent agents"""
+        try:
+            session_ids = [item.session_id or str(uuid.uuid4()) for item in request.messages]
+            results = await self.workflow_service.aprocess_batch([
+                (item.message, session_id) for item, session_id in zip(request.messages, session_ids)
+            ])
+            return self.response_formatter.format_batch_response(results, session_ids)
+            
+        except GatewayRejectedError as e:
+            raise self._overloaded(e)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error processing batch: {str(e)}"
+            )
+
+    async def stream_chat_message(self, request: ChatRequest) -> StreamingResponse:
+        """Stream the classification and agent tokens for a chat message as Server-Sent Events"""
+        session_id = request.session_id or str(uuid.uuid4())
+
+        async def event_stream():
+            try:
+                async for event in self.workflow_service.astream_message(request.message, session_id):
+                    data = event["data"]
+                    if event["event"] == "done":
+                        response = self.response_formatter.format_chat_response(data["result"], session_id)
+                        data = {
+                            **response.model_dump(mode="json"),
+                            "time_to_first_token_ms": data["time_to_first_token_ms"]
+                        }
+                    yield self.response_formatter.format_sse_event(event["event"], data)
+            except Exception as e:
+                yield self.response_formatter.format_sse_event(
+                    "error", {"detail": f"Error processing message: {str(e)}"}
+                )
+
+        return StreamingResponse(
+            event_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    async def get_courses(self) -> dict:
+        """Get the registered course categories"""
+        return {
+            "courses": self.workflow_service.agent_service.courses.names,
+            "description": "Available course categories for message classification"
+        }
+
+    async def get_metrics(self) -> Response:
+        """Render Prometheus metrics"""
+        body, content_type = metrics.render()
+        return Response(content=body, media_type=content_type)
+
+    async def get_classifier_stats(self) -> dict:
+        """Get local pre-classifier and classification cache statistics"""
+        try:
+            agent_service = self.workflow_service.agent_service
+            return {
+                "local_classifier": agent_service.local_classifier.get_stats(),
+                "cache": agent_service.classification_cache.get_stats(),
+                "speculation": agent_service.speculation_stats.get_stats()
+            }
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error retrieving classifier stats: {str(e)}"
+            )
+
+    async def get_gateway_stats(self) -> dict:
+        """Get LLM gateway queue depth, wait time and shedding counters"""
+        try:
+            return self.workflow_service.agent_service.gateway.get_stats()
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error retrieving gateway stats: {str(e)}"
+            )
+
+    async def get_prompt_cache_stats(self) -> dict:
+        """Get the per-course share of prompt tokens served from the provider's prefix cache"""
+        try:
+            return self.workflow_service.agent_service.prompt_cache_stats.get_stats()
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error retrieving prompt cache stats: {str(e)}"
+            )
+
+    async def get_response_cache_stats(self) -> dict:
+        """Get response cache sizes and hit rate"""
+        try:
+            return self.workflow_service.agent_service.response_cache.get_stats()
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error retrieving response cache stats: {str(e)}"
+            )
+
+    async def invalidate_response_cache(self, course: str = None) -> dict:
+        """Invalidate cached answers for a course, or for every course"""
+        try:
+            removed = self.workflow_service.agent_service.response_cache.invalidate(course)
+            return {
+                "course": course,
+                "invalidated": removed,
+                "message": f"Removed {removed} cached answers"
+            }
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error invalidating response cache: {str(e)}"
+            )
+
     async def health_check(self) -> HealthResponse:
         """Perform health check"""
         try:
@@ -43,17 +196,39 @@ class ChatController:
                 detail=f"Health check failed: {str(e)}"
             )
 
-    async def get_session_history(self, session_id: str, limit: int = None) -> ConversationHistoryResponse:
-        """Get conversation history for a session"""
+    async def get_session_history(
+        self,
+        session_id: str,
+        response: Response,
+        limit: int = None,
+        before: int = None,
+        after: int = None,
+        if_none_match: str = None
+    ) -> Union[ConversationHistoryResponse, Response]:
+        """Get a page of conversation history, or 304 Not Modified if the client's copy is current"""
         try:
             memory_service = self.workflow_service.agent_service.memory_service
-            messages = memory_service.get_messages(session_id, limit)
-            
-            return ConversationHistoryResponse(
-                session_id=session_id,
-                messages=messages,
-                total_messages=len(memory_service.get_messages(session_id))
+            # The version is a single lookup, so an unchanged page is answered without reading messages
+            version = memory_service.get_history_version(session_id)
+            page = None
+            if version is not None:
+                etag = self._etag(version, limit, before, after)
+                headers = {"ETag": etag, "Cache-Control": "no-cache"}
+                if self._etag_matches(if_none_match, etag):
+                    return Response(status_code=304, headers=headers)
+                page = memory_service.get_history(session_id, limit, before, after)
+            if page is None:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Session {session_id} not found"
+                )
+
+            response.headers.update(headers)
+            return self.response_formatter.format_history_response(
+                session_id, page.messages, page.total, page.has_more
             )
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=500,
@@ -94,15 +269,18 @@ class ChatController:
                 detail=f"Error deleting session: {str(e)}"
             )
 
-    async def get_active_sessions(self) -> SessionListResponse:
-        """Get list of active sessions"""
+    async def get_active_sessions(
+        self, limit: int = 100, before: Optional[str] = None, after: Optional[str] = None
+    ) -> SessionListResponse:
+        """Get a page of active session IDs"""
         try:
             memory_service = self.workflow_service.agent_service.memory_service
-            sessions = memory_service.get_active_sessions()
+            sessions, has_more = memory_service.list_sessions_page(limit, before, after)
             
             return SessionListResponse(
                 sessions=sessions,
-                total_count=len(sessions)
+                total_count=memory_service.count_sessions(),
+                has_more=has_more
             )
         except Exception as e:
             raise HTTPException(
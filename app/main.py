@@ -1,17 +1,33 @@
-from fastapi import FastAPI, HTTPException, Query
+import time
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from .controllers.chat_controller import ChatController
+from .log import configure_logging
+from .services.metrics import HTTP_LATENCY
 from .models.schemas import (
-    ChatRequest, ChatResponse, HealthResponse,
+    ChatRequest, ChatResponse, HealthResponse, BatchChatRequest, BatchChatResponse,
     SessionStatsResponse, SessionListResponse, ConversationHistoryResponse
 )
 from typing import Optional
+from contextlib import asynccontextmanager
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown hooks"""
+    chat_controller.startup()
+    yield
+    chat_controller.shutdown()
+
+
+configure_logging()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Course Classifier API",
     description="An AI-powered course classifier that routes questions to specialized agents",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -23,6 +39,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    """Record HTTP latency by route template (not raw path) to keep label cardinality bounded"""
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_LATENCY.labels(
+        request.method, route.path if route else "unmatched", str(response.status_code)
+    ).observe(time.perf_counter() - start)
+    return response
+
+
 # Initialize controller
 chat_controller = ChatController()
 
@@ -50,24 +78,100 @@ async def chat(request: ChatRequest):
     return await chat_controller.process_chat_message(request)
 
 
+@app.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch(request: BatchChatRequest):
+    """
+    Process up to 100 chat messages in one request
+    
+    All messages are classified with a single model call, then the specialist agents run
+    concurrently. Results are returned in input order; a failed item carries an `error`
+    instead of a `message`.
+    
+    - **messages**: List of `{message, session_id}` objects
+    """
+    return await chat_controller.process_chat_batch(request)
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Stream a chat response as Server-Sent Events
+    
+    Emits a `classification` event once the course is known, `token` events as the
+    specialist agent generates its answer, and a final `done` event with the full
+    response and time-to-first-token.
+    
+    - **message**: The user's message/question
+    - **session_id**: Optional session ID for tracking conversations
+    """
+    return await chat_controller.stream_chat_message(request)
+
+
 @app.get("/courses")
 async def get_available_courses():
     """Get list of available course categories"""
-    return {
-        "courses": [
-            "Structured Programming Language",
-            "English", 
-            "Physics",
-            "None"
-        ],
-        "description": "Available course categories for message classification"
-    }
+    return await chat_controller.get_courses()
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: per-node and end-to-end latency, token usage, cost and session store health"""
+    return await chat_controller.get_metrics()
+
+
+@app.get("/classifier/stats")
+async def get_classifier_stats():
+    """Get local pre-classifier and classification cache statistics"""
+    return await chat_controller.get_classifier_stats()
+
+
+@app.get("/gateway/stats")
+async def get_gateway_stats():
+    """Get queue depth, wait time and load-shedding counters of the shared LLM gateway"""
+    return await chat_controller.get_gateway_stats()
+
+
+@app.get("/prompt-cache/stats")
+async def get_prompt_cache_stats():
+    """Get the cached-token ratio of agent prompts per course"""
+    return await chat_controller.get_prompt_cache_stats()
+
+
+@app.get("/admin/response-cache")
+async def get_response_cache_stats():
+    """Get per-course sizes and hit rate of the answer cache"""
+    return await chat_controller.get_response_cache_stats()
+
+
+@app.delete("/admin/response-cache")
+async def invalidate_response_cache(
+    course: Optional[str] = Query(None, description="Course to invalidate; all courses if omitted")
+):
+    """
+    Invalidate cached answers
+    
+    - **course**: Optional course name (e.g. "Physics"); every course is cleared if omitted
+    """
+    return await chat_controller.invalidate_response_cache(course)
 
 
 @app.get("/sessions", response_model=SessionListResponse)
-async def get_active_sessions():
-    """Get list of active chat sessions"""
-    return await chat_controller.get_active_sessions()
+async def get_active_sessions(
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of session IDs returned"),
+    before: Optional[str] = Query(None, description="Only return session IDs ordered before this one"),
+    after: Optional[str] = Query(None, description="Only return session IDs ordered after this one")
+):
+    """
+    Get a page of active chat session IDs, in ID order
+    
+    - **limit**: Page size (1-1000, default 100)
+    - **after**: Cursor for the next page: the last ID of the previous page
+    - **before**: Cursor for the previous page: the first ID of the current page
+    
+    Without a cursor, or with only before, the last IDs in order are returned.
+    has_more tells whether more IDs lie beyond the page.
+    """
+    return await chat_controller.get_active_sessions(limit, before, after)
 
 
 @app.get("/sessions/{session_id}", response_model=SessionStatsResponse)
@@ -79,15 +183,25 @@ async def get_session_stats(session_id: str):
 @app.get("/sessions/{session_id}/history", response_model=ConversationHistoryResponse)
 async def get_session_history(
     session_id: str,
-    limit: Optional[int] = Query(None, ge=1, le=100, description="Limit number of messages returned")
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Limit number of messages returned"),
+    before: Optional[int] = Query(None, ge=0, description="Only return messages with a lower seq"),
+    after: Optional[int] = Query(None, ge=-1, description="Only return messages with a higher seq"),
+    if_none_match: Optional[str] = Header(None)
 ):
     """
-    Get conversation history for a session
+    Get a page of conversation history for a session, oldest message first
     
     - **session_id**: The session ID to get history for
     - **limit**: Optional limit on number of messages (1-100)
+    - **before**: Page back: the newest messages with seq below this (e.g. the first seq of the current page)
+    - **after**: Page forward or poll: the oldest messages with seq above this (e.g. the last seq seen)
+    
+    Without a cursor the newest messages are returned. has_more tells whether more messages
+    lie beyond the page. Responses carry an ETag; send it back in If-None-Match to get a
+    304 Not Modified while the page is unchanged. Unknown sessions return 404.
     """
-    return await chat_controller.get_session_history(session_id, limit)
+    return await chat_controller.get_session_history(session_id, response, limit, before, after, if_none_match)
 
 
 @app.post("/sessions/{session_id}/clear")
@@ -3,19 +3,13 @@ from pydantic import BaseModel, Field
 from datetime import datetime
 
 
-class MessageClassifier(BaseModel):
-    """Model for message classification"""
-    course: Literal["Structured Programming Language", "English", "Physics", "None"] = Field(
-        ...,
-        description="Classify the message under which course it falls (None if it doesn't match any)."
-    )
-
-
 class ChatMessage(BaseModel):
     """Model for chat messages"""
     role: Literal["user", "assistant", "system"]
     content: str
     timestamp: Optional[datetime] = None
+    # Position in the session; used as the history cursor
+    seq: Optional[int] = None
 
 
 class ChatRequest(BaseModel):
@@ -32,6 +26,28 @@ class ChatResponse(BaseModel):
     timestamp: datetime
 
 
+class BatchChatRequest(BaseModel):
+    """Model for batch chat requests"""
+    messages: List[ChatRequest] = Field(..., min_length=1, max_length=100)
+
+
+class BatchChatItemResponse(BaseModel):
+    """Model for one result of a batch chat request"""
+    index: int
+    message: Optional[str] = None
+    course: Optional[str] = None
+    session_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchChatResponse(BaseModel):
+    """Model for batch chat responses"""
+    results: List[BatchChatItemResponse]
+    succeeded: int
+    failed: int
+    timestamp: datetime
+
+
 class HealthResponse(BaseModel):
     """Model for health check responses"""
     status: str
@@ -59,6 +75,7 @@ class SessionListResponse(BaseModel):
     """Model for session list responses"""
     sessions: List[str]
     total_count: int
+    has_more: bool = False
 
 
 class ConversationHistoryResponse(BaseModel):
@@ -66,3 +83,4 @@ class ConversationHistoryResponse(BaseModel):
     session_id: str
     messages: List[ChatMessage]
     total_messages: int
+    has_more: bool = False
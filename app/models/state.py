@@ -5,6 +5,19 @@ from langgraph.graph.message import add_messages
 
 class State(TypedDict):
     """State model for LangGraph workflow"""
+    # The session's history from the context window start, loaded by the checkpointer, then this turn's messages
     messages: Annotated[list, add_messages]
+    # The course of the session's last answer until classify_message runs
     course: str | None
     session_id: Optional[str]
+    # Latest running summary, covering the messages before sequence number summary_upto
+    summary: Optional[str]
+    summary_upto: int
+    # Sequence number the prefix-stable context window starts at
+    context_start: int
+    # The summary the current window's prompts carry; the latest one is adopted only when the window restarts
+    window_summary: Optional[str]
+    # Start the likely agent alongside the LLM classifier (see AgentService.classify_message)
+    speculate: bool
+    # A specialist reply drafted speculatively; committed only by the matching agent
+    draft: Optional[dict]
@@ -1,40 +1,96 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+from langchain_core.messages import AIMessage, HumanMessage
 from ..models.state import State
-from ..models.schemas import MessageClassifier
+from .. import config
 from .llm_service import get_llm
+from .llm_gateway import LLMGateway
 from .memory_service import MemoryService
+from .classifier_service import LocalClassifier, SpeculationStats
+from .cache_service import ClassificationCache, PromptCacheStats, ResponseCache
+from .summary_service import SummaryService
+from .course_registry import Course, CourseRegistry
+from .checkpointer import to_stored
+from .metrics import record_usage
+from .session_store import pack_stable_window
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_CLASSIFIER_INSTRUCTIONS = """
+You will receive several numbered messages. Classify each one independently and return exactly one
+category per message, in the same order as the messages are numbered.
+"""
 
 
 class AgentService:
     """Service class for handling different agent types"""
     
     def __init__(self):
-        self.llm = get_llm()
+        self.courses = CourseRegistry.from_file(config.COURSES_FILE)
+        self.gateway = LLMGateway(get_llm)
+        # Bind the structured-output classifiers once rather than per request
+        self.gateway.bind(self.courses.classifier_schema)
+        self.gateway.bind(self.courses.batch_classifier_schema)
         self.memory_service = MemoryService()
+        self.local_classifier = LocalClassifier()
+        self.classification_cache = ClassificationCache()
+        self.response_cache = ResponseCache()
+        self.prompt_cache_stats = PromptCacheStats()
+        self.speculation_stats = SpeculationStats()
+        self.summary_service = SummaryService(self.memory_service, self.gateway)
+
+    def startup(self) -> None:
+        """Start background maintenance tasks"""
+        self.memory_service.start_sweeper()
+        self.memory_service.start_snapshots()
+
+    def shutdown(self) -> None:
+        """Persist state that should survive a restart"""
+        self.classification_cache.save()
+        self.memory_service.close()
 
-    def classify_message(self, state: State) -> dict:
+    def _classify_without_llm(self, text: str, last_course: str = None) -> str:
+        """Classify from the session's last course, the local classifier or the classification cache"""
+        # Follow-ups in an ongoing session stay with that session's course
+        if last_course and config.SESSION_STICKY_ROUTING:
+            if last_course != self.courses.fallback.name and self.local_classifier.is_follow_up(text):
+                self.local_classifier.record_sticky_hit()
+                logger.info("classified", extra={"course": last_course, "source": "follow-up"})
+                return last_course
+
+        # Obvious queries are answered locally without an LLM round trip
+        course = self.local_classifier.classify(text)
+        if course:
+            logger.info("classified", extra={"course": course, "source": "local"})
+            return course
+
+        # Near-identical messages reuse an earlier LLM classification
+        course = self.classification_cache.get(text)
+        if course:
+            logger.info("classified", extra={"course": course, "source": "cache"})
+        return course
+
+    async def classify_message(self, state: State) -> dict:
         """Classify the message into appropriate course category"""
         last_message = state["messages"][-1]
+        # Until this node returns, the course is the one the session's last answer came from
+        last_course = state.get("course")
+
+        course = self._classify_without_llm(last_message.content, last_course)
+        if course:
+            return {"course": course}
+
+        # Optionally draft the likely specialist's answer while the classifier runs
+        guess = self._speculation_guess(last_message.content, last_course) if state.get("speculate") else None
+        speculation = asyncio.create_task(self._timed_draft(guess, state)) if guess else None
 
         messages = [
             {
                 "role": "system",
-                "content": """
-You are a comprehensive course classifier. 
-Carefully read and analyze the user query in detail. 
-Then classify the message into exactly one of the following categories:
-
-- 'Structured Programming Language': If the query is about any structured programming language concepts, 
-  syntax, examples, problem-solving, manual tracing, code rewriting or topics specifically related to C programming or other structured languages.
-
-- 'Physics': If the query is about any physics-related topics, including mechanics, thermodynamics, electromagnetism, 
-  optics, modern physics, equations, laws, experiments, or problem-solving in physics.
-
-- 'English': If the query is about English language topics, including grammar, vocabulary, writing, reading comprehension, 
-  literature analysis, pronunciation, or communication skills.
-
-- 'None': If the query does not fit into any of the above categories or is unrelated to Structured Programming Language, 
-  Physics, or English.
-"""
+                "content": self.courses.classifier_prompt
             },
             {
                 "role": "user",
@@ -42,178 +98,197 @@ Then classify the message into exactly one of the following categories:
             }
         ]
 
-        reply = self.llm.with_structured_output(MessageClassifier).invoke(messages)
+        start = time.perf_counter()
+        try:
+            reply = await self.gateway.ainvoke(
+                messages, node="classify_message", schema=self.courses.classifier_schema
+            )
+        except BaseException:
+            if speculation is not None:
+                speculation.cancel()
+            raise
+        latency = time.perf_counter() - start
+        self.local_classifier.record_llm_call(latency)
+        self.classification_cache.put(last_message.content, reply.course)
         
-        print("[CLASSIFICATION]: " + reply.course)
-        return {
-            "messages": state["messages"],
-            "course": reply.course
-        }
+        logger.info("classified", extra={"course": reply.course, "source": "llm"})
+        update = {"course": reply.course}
+        if speculation is not None:
+            update["draft"] = await self._resolve_speculation(speculation, guess, reply.course, latency)
+        return update
 
-    def router(self, state: State) -> str:
-        """Route to appropriate agent based on classification"""
-        course = state.get("course", "None")
-        if course == "Structured Programming Language":
-            return "spl_agent"
-        elif course == "English":
-            return "english_agent"
-        elif course == "Physics":
-            return "physics_agent"
-        else:
-            return "fallback_agent"
+    def _speculation_guess(self, text: str, last_course: str = None) -> Optional[Course]:
+        """Guess the course cheaply: the session's previous course, else the local model's best label"""
+        name = last_course or self.local_classifier.guess(text)
+        return self.courses.get(name) if name else None
 
-    def spl_agent(self, state: State) -> dict:
-        """Handle Structured Programming Language queries"""
-        last_message = state["messages"][-1]
-        session_id = state.get("session_id")
-        
-        # Get conversation context if session exists
-        context_messages = []
-        if session_id:
-            context_messages = self.memory_service.get_conversation_context(session_id, limit=10)
-        
-        # Prepare messages with context
-        messages = [
-            {
-                "role": "system",
-                "content": "You are an expert in Structured Programming Languages, especially C. Answer the user's programming questions clearly. Use the conversation history to provide contextual responses."
-            }
-        ]
-        
-        # Add conversation context
-        messages.extend(context_messages)
-        
-        # Add current message if not already in context
-        if not context_messages or context_messages[-1]["content"] != last_message.content:
-            messages.append({
-                "role": "user",
-                "content": last_message.content
-            })
+    async def _timed_draft(self, course: Course, state: State) -> tuple:
+        start = time.perf_counter()
+        draft = await self._draft(course, state)
+        return draft, time.perf_counter() - start
 
-        reply = self.llm.invoke(messages)
-        
-        # Store conversation in memory
-        if session_id:
-            self.memory_service.add_message(session_id, "user", last_message.content)
-            self.memory_service.add_message(session_id, "assistant", reply.content)
-        
-        return {
-            "messages": state["messages"] + [reply]
-        }
+    async def _resolve_speculation(
+        self, speculation: asyncio.Task, guess: Course, course: str, classify_latency: float
+    ) -> Optional[dict]:
+        """Keep the speculative draft if it was for the classified course, otherwise cancel it"""
+        if guess.name != self.courses.get(course).name:
+            speculation.cancel()
+            self.speculation_stats.record_miss()
+            return None
+        try:
+            draft, draft_latency = await speculation
+        except Exception:
+            logger.warning("speculative draft failed", exc_info=True, extra={"course": course})
+            self.speculation_stats.record_miss()
+            return None
+        # Run serially, the two calls would have cost the sum; in parallel, the longer of the two
+        self.speculation_stats.record_hit(min(classify_latency, draft_latency))
+        return draft
 
-    def english_agent(self, state: State) -> dict:
-        """Handle English language queries"""
-        last_message = state["messages"][-1]
-        session_id = state.get("session_id")
-        
-        # Get conversation context if session exists
-        context_messages = []
-        if session_id:
-            context_messages = self.memory_service.get_conversation_context(session_id, limit=10)
-        
-        # Prepare messages with context
+    async def classify_batch(self, texts: List[str], session_ids: List[str] = None) -> List[str]:
+        """Classify several messages, sending all that need the LLM in one structured-output call"""
+        session_ids = session_ids or [None] * len(texts)
+        last_courses = [
+            self.memory_service.get_metadata(session_id).get("last_course") if session_id else None
+            for session_id in session_ids
+        ]
+        courses = [self._classify_without_llm(text, last) for text, last in zip(texts, last_courses)]
+        pending = [i for i, course in enumerate(courses) if not course]
+        if not pending:
+            return courses
+
+        numbered = "\n\n".join(f"{n}. {texts[i]}" for n, i in enumerate(pending, start=1))
         messages = [
             {
                 "role": "system",
-                "content": "You are an expert in English language and literature. Provide helpful answers to grammar, vocabulary, and literature questions. Use the conversation history to provide contextual responses."
+                "content": self.courses.classifier_prompt + BATCH_CLASSIFIER_INSTRUCTIONS
+            },
+            {
+                "role": "user",
+                "content": numbered
             }
         ]
-        
-        # Add conversation context
-        messages.extend(context_messages)
-        
-        # Add current message if not already in context
-        if not context_messages or context_messages[-1]["content"] != last_message.content:
-            messages.append({
-                "role": "user",
-                "content": last_message.content
-            })
 
-        reply = self.llm.invoke(messages)
-        
-        # Store conversation in memory
-        if session_id:
-            self.memory_service.add_message(session_id, "user", last_message.content)
-            self.memory_service.add_message(session_id, "assistant", reply.content)
-        
+        start = time.perf_counter()
+        reply = await self.gateway.ainvoke(
+            messages, node="classify_batch", schema=self.courses.batch_classifier_schema
+        )
+        self.local_classifier.record_llm_call(time.perf_counter() - start)
+
+        if len(reply.courses) != len(pending):
+            # The model miscounted; classify the leftovers one by one rather than guess
+            logger.warning(
+                "batch classification miscounted",
+                extra={"labels": len(reply.courses), "messages": len(pending)}
+            )
+            results = await asyncio.gather(*[
+                self.classify_message({"messages": [HumanMessage(content=texts[i])]}) for i in pending
+            ])
+            labels = [result["course"] for result in results]
+        else:
+            labels = reply.courses
+            for i, course in zip(pending, labels):
+                self.classification_cache.put(texts[i], course)
+
+        for i, course in zip(pending, labels):
+            courses[i] = course
+        logger.info("classified batch", extra={"messages": len(texts), "via_llm": len(pending)})
+        return courses
+
+    def _get_context(self, state: State, course: str) -> tuple:
+        """
+        Pack the history in the state into a prefix-stable window within the course's token budget.
+
+        Returns the window, the sequence number it starts at and the summary
+        that goes with it, which the checkpointer saves with the turn. A summary
+        folded in the background changes the prompt's first message, so it is
+        only adopted when the window restarts and the prefix changes anyway;
+        the restarted window then leaves out the messages it covers.
+        """
+        history = [to_stored(message) for message in state["messages"][:-1] if message.type != "system"]
+        budget = config.CONTEXT_TOKEN_BUDGETS.get(course, config.CONTEXT_TOKEN_BUDGET)
+        summary = state.get("window_summary")
+        if sum(message.tokens for message in history) > budget:
+            summary = state.get("summary")
+            history = [message for message in history if message.seq >= state.get("summary_upto", 0)]
+        window, start = pack_stable_window(
+            history, budget, state.get("context_start", 0), config.CONTEXT_REFILL_FRACTION
+        )
+        return window, start, summary
+
+    def _system_message(self, course: Course, summary: str = None) -> dict:
+        """Get a course's system message, with the running conversation summary appended if any"""
+        if not summary:
+            return self.courses.system_messages[course.name]
         return {
-            "messages": state["messages"] + [reply]
+            "role": "system",
+            "content": f"{course.prompt}\n\nSummary of the earlier conversation:\n{summary}"
         }
 
-    def physics_agent(self, state: State) -> dict:
-        """Handle Physics queries"""
-        last_message = state["messages"][-1]
-        session_id = state.get("session_id")
-        
-        # Get conversation context if session exists
-        context_messages = []
-        if session_id:
-            context_messages = self.memory_service.get_conversation_context(session_id, limit=10)
-        
-        # Prepare messages with context
-        messages = [
-            {
-                "role": "system",
-                "content": "You are an expert physicist. Provide clear and concise answers to physics questions. Use the conversation history to provide contextual responses and build upon previous explanations."
-            }
-        ]
-        
-        # Add conversation context
-        messages.extend(context_messages)
-        
-        # Add current message if not already in context
-        if not context_messages or context_messages[-1]["content"] != last_message.content:
-            messages.append({
-                "role": "user",
-                "content": last_message.content
-            })
+    async def _generate_reply(self, course: Course, messages: list, question: str, context_free: bool) -> tuple:
+        """Invoke the LLM, serving context-free questions from the response cache when possible"""
+        if context_free:
+            cached = self.response_cache.get(course.name, question)
+            if cached is not None:
+                return AIMessage(content=cached), True
 
-        reply = self.llm.invoke(messages)
-        
-        # Store conversation in memory
-        if session_id:
-            self.memory_service.add_message(session_id, "user", last_message.content)
-            self.memory_service.add_message(session_id, "assistant", reply.content)
-        
+        reply = await self.gateway.ainvoke(messages, node=course.node)
+        usage = getattr(reply, "usage_metadata", None)
+        self.prompt_cache_stats.record(course.name, usage)
+        record_usage(course.name, usage)
+        return reply, False
+
+    def router(self, state: State) -> str:
+        """Route to appropriate agent based on classification"""
+        return self.courses.node_for(state.get("course"))
+
+    def build_agents(self) -> Dict[str, Callable]:
+        """Create one agent node per course, keyed by node name"""
+        return {course.node: self._make_agent(course) for course in self.courses.courses}
+
+    def _make_agent(self, course: Course) -> Callable:
+        async def agent(state: State) -> dict:
+            return await self.answer(course, state)
+        agent.__name__ = course.node
+        agent.__doc__ = f"Handle {course.name} queries"
+        return agent
+
+    async def answer(self, course: Course, state: State) -> dict:
+        """Answer the last message as the given course's specialist"""
+        draft = state.get("draft")
+        if not draft or draft["course"] != course.name:
+            draft = await self._draft(course, state)
+        self._commit(state, draft)
+        # The checkpointer saves the new messages and window start once the run completes
         return {
-            "messages": state["messages"] + [reply]
+            "messages": [draft["reply"]],
+            "course": course.name,
+            "context_start": draft["context_start"],
+            "window_summary": draft["summary"],
+            "draft": None
         }
 
-    def fallback_agent(self, state: State) -> dict:
-        """Handle general queries that don't fit other categories"""
-        last_message = state["messages"][-1]
-        session_id = state.get("session_id")
-        
-        # Get conversation context if session exists
-        context_messages = []
-        if session_id:
-            context_messages = self.memory_service.get_conversation_context(session_id, limit=10)
-        
-        # Prepare messages with context
-        messages = [
-            {
-                "role": "system",
-                "content": "You are a helpful and concise general-purpose assistant. Use the conversation history to provide contextual and relevant responses."
-            }
-        ]
-        
-        # Add conversation context
-        messages.extend(context_messages)
-        
-        # Add current message if not already in context
-        if not context_messages or context_messages[-1]["content"] != last_message.content:
-            messages.append({
-                "role": "user",
-                "content": last_message.content
-            })
+    async def _draft(self, course: Course, state: State) -> dict:
+        """Build the specialist's prompt from the state and get its reply without writing any session state"""
+        question = state["messages"][-1].content
+        context_messages, context_start, summary = self._get_context(state, course.name)
 
-        reply = self.llm.invoke(messages)
-        
-        # Store conversation in memory
-        if session_id:
-            self.memory_service.add_message(session_id, "user", last_message.content)
-            self.memory_service.add_message(session_id, "assistant", reply.content)
-        
+        messages = [self._system_message(course, summary), *context_messages, {"role": "user", "content": question}]
+
+        context_free = not context_messages and not summary
+        reply, cached = await self._generate_reply(course, messages, question, context_free)
         return {
-            "messages": state["messages"] + [reply]
+            "course": course.name,
+            "reply": reply,
+            "context_free": context_free,
+            "cached": cached,
+            "context_start": context_start,
+            "summary": summary
         }
+
+    def _commit(self, state: State, draft: dict) -> None:
+        """Write a drafted reply to the response cache"""
+        question = state["messages"][-1].content
+        reply = draft["reply"]
+        if draft["context_free"] and not draft["cached"] and isinstance(reply.content, str):
+            self.response_cache.put(draft["course"], question, reply.content)
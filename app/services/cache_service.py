@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional
+from .. import config
+from .classifier_service import tokenize
+
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+_CLITICS = re.compile(r"'(?:s|re|ve|ll|d|m)\b")
+
+
+def normalize_message(message: str) -> str:
+    """Fold case, punctuation and whitespace so near-identical messages match"""
+    folded = _PUNCTUATION.sub(" ", message.lower())
+    return _WHITESPACE.sub(" ", folded).strip()
+
+
+def question_key(question: str) -> tuple:
+    """Content words and numbers of a question, in order; contractions other than n't are dropped"""
+    expanded = _CLITICS.sub("", question.lower().replace("\u2019", "'")).replace("n't", " not")
+    return tuple(tokenize(expanded))
+
+
+def message_key(message: str) -> str:
+    """Hash of the normalized message used as a cache key"""
+    return hashlib.sha1(normalize_message(message).encode("utf-8")).hexdigest()
+
+
+class ClassificationCache:
+    """Bounded LRU/TTL cache of course classifications keyed by normalized message"""
+
+    def __init__(
+        self,
+        max_size: int = config.CLASSIFICATION_CACHE_SIZE,
+        ttl_seconds: float = config.CLASSIFICATION_CACHE_TTL_SECONDS,
+        path: Optional[str] = config.CLASSIFICATION_CACHE_FILE
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        # key -> (course, expires_at); ordered from least to most recently used
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._dirty = False
+        if self.path:
+            self.load()
+
+    def get(self, message: str) -> Optional[str]:
+        """Return the cached course for a message, if present and fresh"""
+        key = message_key(message)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, message: str, course: str) -> None:
+        """Store a classification, evicting the least recently used entry when full"""
+        key = message_key(message)
+        with self._lock:
+            self._entries[key] = (course, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def clear(self) -> None:
+        """Drop all cached classifications"""
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+
+    def load(self) -> None:
+        """Load unexpired entries from the backing file"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            entries = json.load(f)
+        now = time.time()
+        with self._lock:
+            for key, course, expires_at in entries[-self.max_size:]:
+                if expires_at > now:
+                    self._entries[key] = (course, expires_at)
+
+    def save(self) -> None:
+        """Atomically write the cache to the backing file if it changed"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [[key, course, expires_at] for key, (course, expires_at) in self._entries.items()]
+            self._dirty = False
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache size and hit/miss counters"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "persistent": bool(self.path)
+            }
+
+
+class ResponseCache:
+    """
+    LRU cache of specialist answers for context-free questions, partitioned by course.
+
+    Questions are keyed by their content words and numbers in order (see
+    question_key), so phrasing, stopwords, contractions, case and punctuation
+    may differ ("What's a pointer in C" reuses "What is a pointer in C?"), but
+    a different number or key word ("20 m/s" vs "30 m/s") never does.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = config.RESPONSE_CACHE_ENABLED,
+        max_entries_per_course: int = config.RESPONSE_CACHE_SIZE
+    ):
+        self.enabled = enabled
+        self.max_entries_per_course = max_entries_per_course
+        # course -> question key -> answer; ordered from least to most recently used
+        self._courses: Dict[str, "OrderedDict[tuple, str]"] = defaultdict(OrderedDict)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, course: str, question: str) -> Optional[str]:
+        """Return the cached answer to the same question in the same course"""
+        if not self.enabled:
+            return None
+        key = question_key(question)
+        with self._lock:
+            entries = self._courses.get(course)
+            answer = entries.get(key) if entries is not None and key else None
+            if answer is None:
+                self._misses += 1
+                return None
+            entries.move_to_end(key)
+            self._hits += 1
+            return answer
+
+    def put(self, course: str, question: str, answer: str) -> None:
+        """Cache an answer, evicting the course's least recently used entry when full"""
+        key = question_key(question)
+        # A question of nothing but stopwords ("what is it?") says too little to answer from cache
+        if not self.enabled or not key:
+            return
+        with self._lock:
+            entries = self._courses[course]
+            entries[key] = answer
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries_per_course:
+                entries.popitem(last=False)
+
+    def invalidate(self, course: Optional[str] = None) -> int:
+        """Drop cached answers for one course, or for all courses; returns the number removed"""
+        with self._lock:
+            if course is None:
+                removed = sum(len(entries) for entries in self._courses.values())
+                self._courses.clear()
+                return removed
+            entries = self._courses.pop(course, None)
+            return len(entries) if entries else 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-course sizes and hit/miss counters"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "courses": {course: len(entries) for course, entries in self._courses.items()},
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0
+            }
+
+
+class PromptCacheStats:
+    """Per-course share of prompt tokens the provider served from its prefix cache"""
+
+    def __init__(self):
+        # course -> [calls, input_tokens, cached_tokens]
+        self._courses: Dict[str, List[int]] = defaultdict(lambda: [0, 0, 0])
+        self._lock = threading.Lock()
+
+    def record(self, course: str, usage: Optional[Dict[str, Any]]) -> None:
+        """Record the usage metadata of one model reply, if the provider reported any"""
+        if not usage:
+            return
+        cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+        with self._lock:
+            totals = self._courses[course]
+            totals[0] += 1
+            totals[1] += usage.get("input_tokens", 0)
+            totals[2] += cached
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get calls, input tokens, cached tokens and the cached-token ratio per course"""
+        with self._lock:
+            return {
+                course: {
+                    "calls": calls,
+                    "input_tokens": input_tokens,
+                    "cached_tokens": cached_tokens,
+                    "cached_ratio": cached_tokens / input_tokens if input_tokens else 0.0
+                }
+                for course, (calls, input_tokens, cached_tokens) in self._courses.items()
+            }
@@ -0,0 +1,165 @@
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple, empty_checkpoint
+)
+from .session_store import SessionStore, StoredMessage
+from .tokenizer import estimate_tokens
+
+
+# Messages loaded from the store carry their sequence number in their id and
+# their stored token count in response_metadata, so neither is recomputed per turn
+STORED_ID_PREFIX = "seq-"
+
+_MESSAGE_TYPES = {"user": HumanMessage, "assistant": AIMessage, "system": SystemMessage}
+_ROLES = {"human": "user", "ai": "assistant", "system": "system"}
+
+
+def to_message(stored: StoredMessage) -> BaseMessage:
+    """Convert a stored message to a LangChain message whose id records its sequence number"""
+    return _MESSAGE_TYPES[stored.role](
+        content=stored.content, id=f"{STORED_ID_PREFIX}{stored.seq}", response_metadata={"tokens": stored.tokens}
+    )
+
+
+def message_seq(message: BaseMessage) -> Optional[int]:
+    """Sequence number of a message loaded from the store, or None for a message of the current turn"""
+    if message.id and message.id.startswith(STORED_ID_PREFIX):
+        return int(message.id[len(STORED_ID_PREFIX):])
+    return None
+
+
+def to_stored(message: BaseMessage) -> StoredMessage:
+    """Convert a loaded message back to the stored form used for window packing"""
+    tokens = message.response_metadata.get("tokens")
+    if tokens is None:
+        tokens = estimate_tokens(message.content)
+    return StoredMessage(_ROLES[message.type], message.content, 0.0, tokens, message_seq(message))
+
+
+class SessionCheckpointer(BaseCheckpointSaver):
+    """
+    LangGraph checkpointer that keeps each thread (thread_id = session_id) in the session store.
+
+    A session holds one checkpoint, the latest. It is not serialized as a blob:
+    loading rebuilds the graph state from the session's messages since the
+    context window start and its metadata, and saving a completed turn appends
+    its new messages and records the course, window start and window summary. Whichever backend is
+    configured, in-memory or SQLite, is therefore also the checkpoint store,
+    and MemoryService reads the same data. Intermediate checkpoints, pending
+    writes and checkpoint history are not kept, so graphs must be run with
+    durability="exit" and without interrupts.
+    """
+
+    def __init__(self, store: SessionStore):
+        super().__init__()
+        self.store = store
+
+    def _config(self, session_id: str, checkpoint_id: str) -> RunnableConfig:
+        return {"configurable": {"thread_id": session_id, "checkpoint_ns": "", "checkpoint_id": checkpoint_id}}
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        session_id = config["configurable"]["thread_id"]
+        metadata = self.store.get_metadata(session_id)
+        stored = self.store.get_messages_since(session_id, metadata.get("context_start", 0))
+        if stored is None:
+            return None
+
+        values: Dict[str, Any] = {
+            "messages": [to_message(msg) for msg in stored],
+            "context_start": metadata.get("context_start", 0),
+            "summary_upto": metadata.get("summary_upto", 0)
+        }
+        if metadata.get("last_course"):
+            values["course"] = metadata["last_course"]
+        if metadata.get("summary"):
+            values["summary"] = metadata["summary"]
+        if metadata.get("window_summary"):
+            values["window_summary"] = metadata["window_summary"]
+
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = values
+        checkpoint["channel_versions"] = {channel: 1 for channel in values}
+        return CheckpointTuple(
+            config=self._config(session_id, checkpoint["id"]),
+            checkpoint=checkpoint,
+            metadata={"source": "loop", "step": 0, "parents": {}},
+            parent_config=None,
+            pending_writes=[]
+        )
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[CheckpointTuple]:
+        if config is None or before is not None:
+            return
+        checkpoint = self.get_tuple(config)
+        if checkpoint is not None:
+            yield checkpoint
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        session_id = config["configurable"]["thread_id"]
+        values = checkpoint["channel_values"]
+        messages = values.get("messages") or []
+        # Only a completed turn is saved; a run that failed before the reply leaves the session untouched
+        if messages and isinstance(messages[-1], AIMessage):
+            new = [message for message in messages if message_seq(message) is None]
+            if new:
+                self.store.append_messages(session_id, [(_ROLES[message.type], message.content) for message in new])
+                self.store.update_metadata(session_id, {
+                    "last_course": values.get("course"),
+                    "context_start": values.get("context_start", 0),
+                    "window_summary": values.get("window_summary")
+                })
+        return self._config(session_id, checkpoint["id"])
+
+    def put_writes(
+        self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = ""
+    ) -> None:
+        """Pending writes are only needed to resume interrupted runs, which this checkpointer does not support"""
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.store.delete_session(thread_id)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[CheckpointTuple]:
+        for checkpoint in self.list(config, filter=filter, before=before, limit=limit):
+            yield checkpoint
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = ""
+    ) -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
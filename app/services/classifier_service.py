@@ -0,0 +1,249 @@
+import json
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+from .. import config
+from .metrics import SPECULATION_SAVED, SPECULATIONS
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9_#+']+")
+
+STOPWORDS = frozenset({
+    "a", "an", "the", "is", "are", "was", "were", "be", "to", "of", "in", "on", "for",
+    "and", "or", "what", "how", "why", "do", "does", "i", "me", "my", "you", "it",
+    "this", "that", "with", "can", "please", "explain", "give", "using", "use", "by"
+})
+
+
+# A follow-up opens with a phrase that leans on the previous turn ("why?", "and then?",
+# "give another example"), optionally after a polite lead-in
+FOLLOW_UP_OPENER = re.compile(
+    r"^\W*(?:(?:ok|okay|so|but|please)\W+)?(?:(?:can|could|would) you\W+)?"
+    r"(why|how come|and then|and|then|what about|what do you mean|what does that mean|tell me more|more|"
+    r"again|another|go on|continue|elaborate|clarify|explain|say|give(?: me)?|show(?: me)?|simpler|example)\b",
+    re.IGNORECASE
+)
+
+# ...and has nothing but these words after it; any content word left ("why is the sky blue?")
+# makes it a new question
+FOLLOW_UP_FILLER = frozenset({
+    "it", "its", "it's", "that", "that's", "this", "those", "these", "them", "they", "again", "more",
+    "another", "example", "examples", "one", "further", "simpler", "simply", "differently", "please",
+    "then", "so", "on", "me", "us", "a", "an", "the", "is", "was", "are", "does", "do", "did", "mean",
+    "you", "can", "could", "would", "about", "in", "detail", "bit", "little", "step", "by", "what",
+    "what's", "how", "happen", "happens", "work", "works", "why", "and", "ok", "okay", "same", "above",
+    "previous", "other", "else", "also", "way", "explain", "say", "give", "show", "to", "with", "one's"
+})
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase and split text into content tokens"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class KeywordIndex:
+    """Regex index mapping unambiguous course keywords to a label"""
+
+    def __init__(self, patterns: Dict[str, List[str]]):
+        self.patterns = {
+            course: [re.compile(pattern, re.IGNORECASE) for pattern in course_patterns]
+            for course, course_patterns in patterns.items()
+        }
+
+    @classmethod
+    def from_file(cls, path: str) -> "KeywordIndex":
+        """Load keyword patterns from a JSON file of {course: [regex, ...]}"""
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def classify(self, text: str) -> Optional[str]:
+        """Return a course only if its keywords match and no other course's do"""
+        hits = {
+            course: sum(1 for pattern in patterns if pattern.search(text))
+            for course, patterns in self.patterns.items()
+        }
+        matched = [course for course, count in hits.items() if count > 0]
+        return matched[0] if len(matched) == 1 else None
+
+    def matches_any(self, text: str) -> bool:
+        """Whether any course's keywords occur in the text"""
+        return any(pattern.search(text) for patterns in self.patterns.values() for pattern in patterns)
+
+
+class NaiveBayesClassifier:
+    """Multinomial naive Bayes model over bag-of-words tokens"""
+
+    def __init__(self):
+        self.class_counts: Counter = Counter()
+        self.token_counts: Dict[str, Counter] = defaultdict(Counter)
+        self.token_totals: Counter = Counter()
+        self.vocabulary = set()
+
+    @classmethod
+    def from_file(cls, path: str) -> "NaiveBayesClassifier":
+        """Train on a JSONL file of {"text": ..., "course": ...} rows"""
+        model = cls()
+        with open(path, encoding="utf-8") as f:
+            model.fit(json.loads(line) for line in f if line.strip())
+        return model
+
+    def fit(self, examples) -> None:
+        """Accumulate counts from labeled examples"""
+        for example in examples:
+            course = example["course"]
+            tokens = tokenize(example["text"])
+            self.class_counts[course] += 1
+            self.token_counts[course].update(tokens)
+            self.token_totals[course] += len(tokens)
+            self.vocabulary.update(tokens)
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """Return the most likely course and its posterior probability"""
+        tokens = [token for token in tokenize(text) if token in self.vocabulary]
+        if not tokens or not self.class_counts:
+            return None, 0.0
+
+        total_docs = sum(self.class_counts.values())
+        vocab_size = len(self.vocabulary)
+        log_scores = {}
+        for course, doc_count in self.class_counts.items():
+            score = math.log(doc_count / total_docs)
+            denominator = self.token_totals[course] + vocab_size
+            for token in tokens:
+                score += math.log((self.token_counts[course][token] + 1) / denominator)
+            log_scores[course] = score
+
+        best = max(log_scores, key=log_scores.get)
+        normalizer = sum(math.exp(score - log_scores[best]) for score in log_scores.values())
+        return best, 1.0 / normalizer
+
+
+class LocalClassifier:
+    """Tiered local classifier answering obvious queries without an LLM call"""
+
+    def __init__(
+        self,
+        threshold: float = config.LOCAL_CLASSIFIER_THRESHOLD,
+        keywords_path: str = config.LOCAL_CLASSIFIER_KEYWORDS,
+        training_path: str = config.LOCAL_CLASSIFIER_TRAINING,
+        enabled: bool = config.LOCAL_CLASSIFIER_ENABLED,
+        follow_up_max_words: int = config.STICKY_MAX_WORDS
+    ):
+        self.threshold = threshold
+        self.enabled = enabled
+        self.follow_up_max_words = follow_up_max_words
+        self.keyword_index = KeywordIndex.from_file(keywords_path) if enabled else None
+        self.model = NaiveBayesClassifier.from_file(training_path) if enabled else None
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._keyword_hits = 0
+        self._model_hits = 0
+        self._sticky_hits = 0
+        self._llm_calls = 0
+        self._llm_latency_total = 0.0
+
+    def classify(self, text: str) -> Optional[str]:
+        """Return a confident course label, or None to defer to the LLM"""
+        course, tier = None, None
+        if self.enabled:
+            course = self.keyword_index.classify(text)
+            tier = "keyword"
+            if course is None:
+                course, probability = self.model.predict(text)
+                tier = "model"
+                if probability < self.threshold:
+                    course = None
+
+        with self._lock:
+            self._requests += 1
+            if course and tier == "keyword":
+                self._keyword_hits += 1
+            elif course:
+                self._model_hits += 1
+        return course
+
+    def guess(self, text: str) -> Optional[str]:
+        """The local model's best label regardless of confidence, for speculative work only"""
+        if not self.enabled:
+            return None
+        course, _ = self.model.predict(text)
+        return course
+
+    def is_follow_up(self, text: str) -> bool:
+        """Whether a message only continues the previous turn, naming no new topic"""
+        if len(text.split()) > self.follow_up_max_words:
+            return False
+        opener = FOLLOW_UP_OPENER.match(text)
+        if opener is None:
+            return False
+        return all(token in FOLLOW_UP_FILLER for token in TOKEN_PATTERN.findall(text[opener.end():].lower()))
+
+    def record_sticky_hit(self) -> None:
+        """Record a follow-up routed to the session's previous course"""
+        with self._lock:
+            self._requests += 1
+            self._sticky_hits += 1
+
+    def record_llm_call(self, latency_seconds: float) -> None:
+        """Record the latency of an LLM classification fallback"""
+        with self._lock:
+            self._llm_calls += 1
+            self._llm_latency_total += latency_seconds
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get hit rate and estimated latency saved by local classification"""
+        with self._lock:
+            hits = self._keyword_hits + self._model_hits + self._sticky_hits
+            avg_llm_latency = self._llm_latency_total / self._llm_calls if self._llm_calls else 0.0
+            return {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "requests": self._requests,
+                "keyword_hits": self._keyword_hits,
+                "model_hits": self._model_hits,
+                "sticky_hits": self._sticky_hits,
+                "llm_fallbacks": self._llm_calls,
+                "hit_rate": hits / self._requests if self._requests else 0.0,
+                "avg_llm_latency_ms": avg_llm_latency * 1000,
+                "estimated_latency_saved_ms": hits * avg_llm_latency * 1000
+            }
+
+
+class SpeculationStats:
+    """Hit rate and latency saved by drafting the likely agent's answer during classification"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._saved_total = 0.0
+
+    def record_hit(self, saved_seconds: float) -> None:
+        """Record a draft that matched the classification and was committed"""
+        with self._lock:
+            self._hits += 1
+            self._saved_total += saved_seconds
+        SPECULATIONS.labels("hit").inc()
+        SPECULATION_SAVED.inc(saved_seconds)
+
+    def record_miss(self) -> None:
+        """Record a draft that was discarded"""
+        with self._lock:
+            self._misses += 1
+        SPECULATIONS.labels("miss").inc()
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get speculation counts, hit rate and latency saved"""
+        with self._lock:
+            attempts = self._hits + self._misses
+            return {
+                "enabled": config.SPECULATIVE_EXECUTION,
+                "attempts": attempts,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / attempts if attempts else 0.0,
+                "latency_saved_ms": self._saved_total * 1000,
+                "avg_latency_saved_ms": self._saved_total / self._hits * 1000 if self._hits else 0.0
+            }
@@ -0,0 +1,75 @@
+import json
+from typing import Dict, List, Literal, NamedTuple, Optional
+from pydantic import BaseModel, Field, create_model
+
+
+CLASSIFIER_HEADER = """
+You are a comprehensive course classifier. 
+Carefully read and analyze the user query in detail. 
+Then classify the message into exactly one of the following categories:
+"""
+
+
+class Course(NamedTuple):
+    """One course: its label, graph node and prompts"""
+    name: str
+    node: str
+    description: str
+    prompt: str
+    fallback: bool = False
+
+
+class CourseRegistry:
+    """
+    Courses loaded from a JSON file, and everything derived from them.
+
+    The classifier prompt, the structured-output schemas, the router mapping
+    and each agent's system message are built once here rather than on every
+    request, so adding a course only means adding an entry to the file.
+    """
+
+    def __init__(self, courses: List[Course]):
+        fallbacks = [course for course in courses if course.fallback]
+        if len(fallbacks) != 1:
+            raise ValueError("Exactly one course must be marked as the fallback")
+        self.courses = courses
+        self.fallback = fallbacks[0]
+        self._by_name: Dict[str, Course] = {course.name: course for course in courses}
+        self.names = [course.name for course in courses]
+        self.classifier_prompt = CLASSIFIER_HEADER + "".join(
+            f"\n- '{course.name}': {course.description}\n" for course in courses
+        )
+        # System messages for turns without a running summary; shared, never mutated
+        self.system_messages = {course.name: {"role": "system", "content": course.prompt} for course in courses}
+
+        course_name = Literal[tuple(self.names)]
+        self.classifier_schema = create_model(
+            "MessageClassifier",
+            __base__=BaseModel,
+            course=(course_name, Field(
+                ...,
+                description=f"Classify the message under which course it falls ({self.fallback.name} if it doesn't match any)."
+            ))
+        )
+        self.batch_classifier_schema = create_model(
+            "BatchMessageClassifier",
+            __base__=BaseModel,
+            courses=(List[course_name], Field(
+                ...,
+                description=f"One course per message, in the same order as the numbered input messages ({self.fallback.name} if a message doesn't match any)."
+            ))
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "CourseRegistry":
+        """Load courses from a JSON list of {"name", "node", "description", "prompt", "fallback"?}"""
+        with open(path, encoding="utf-8") as f:
+            return cls([Course(**entry) for entry in json.load(f)])
+
+    def get(self, name: Optional[str]) -> Course:
+        """Get a course by label, or the fallback course for unknown labels"""
+        return self._by_name.get(name, self.fallback)
+
+    def node_for(self, name: Optional[str]) -> str:
+        """Get the graph node that answers a course"""
+        return self.get(name).node
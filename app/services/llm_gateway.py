@@ -0,0 +1,369 @@
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, NamedTuple, Optional
+from langchain_core.callbacks import AsyncCallbackHandler, BaseCallbackManager
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import ensure_config, merge_configs
+from langchain_core.tracers._streaming import _StreamingCallbackHandler
+from .. import config
+from .metrics import LLM_CALL_LATENCY, LLM_IN_FLIGHT, LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT
+
+
+class GatewayRejectedError(Exception):
+    """Raised when the gateway sheds or gives up on a model call instead of returning a reply"""
+    status_code = 503
+    retry_after_seconds = 1
+
+
+class GatewaySaturatedError(GatewayRejectedError):
+    """The wait queue for model calls is full"""
+    status_code = 503
+
+
+class RateLimitedError(GatewayRejectedError):
+    """The call would have to wait longer than allowed for a rate-limit token"""
+    status_code = 429
+
+
+class ModelTimeoutError(GatewayRejectedError):
+    """Every attempt at the call timed out"""
+    status_code = 504
+
+
+class CallPolicy(NamedTuple):
+    """Timeout, retry and hedging settings for the model calls of one node"""
+    timeout_seconds: float = 60.0
+    max_retries: int = 2
+    backoff_base_seconds: float = 0.25
+    backoff_max_seconds: float = 4.0
+    hedge: bool = False
+    # Used until enough latencies have been observed to hedge at the node's p95
+    hedge_delay_seconds: float = 2.0
+
+
+# Classification is short and on every request: fail fast and hedge stragglers.
+# Agent answers can legitimately take long and stream tokens, so they are not hedged.
+DEFAULT_CALL_POLICIES = {
+    "classify_message": CallPolicy(timeout_seconds=8.0, hedge=True, hedge_delay_seconds=1.5),
+    "classify_batch": CallPolicy(timeout_seconds=30.0),
+    "summarize": CallPolicy(timeout_seconds=60.0, max_retries=1),
+}
+
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+TRANSIENT_ERROR_NAMES = {
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError",
+    "ServerError", "APIConnectionError", "APITimeoutError", "RateLimitError"
+}
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether a failed model call is worth retrying"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    for attribute in ("status_code", "code"):
+        if getattr(error, attribute, None) in TRANSIENT_STATUS_CODES:
+            return True
+    return type(error).__name__ in TRANSIENT_ERROR_NAMES
+
+
+def load_call_policies(overrides: Dict[str, Dict[str, Any]]) -> Dict[str, CallPolicy]:
+    """Merge per-node overrides such as {"physics_agent": {"timeout_seconds": 90}} into the defaults"""
+    policies = dict(DEFAULT_CALL_POLICIES)
+    for node, values in overrides.items():
+        policies[node] = policies.get(node, CallPolicy())._replace(**values)
+    return policies
+
+
+def streams_tokens(run_config: RunnableConfig) -> bool:
+    """Whether a model call made under this config streams its tokens to a callback (e.g. astream_events)"""
+    callbacks = run_config.get("callbacks") or []
+    handlers = callbacks.handlers if isinstance(callbacks, BaseCallbackManager) else callbacks
+    return any(isinstance(handler, _StreamingCallbackHandler) for handler in handlers)
+
+
+class _OutputWatcher(AsyncCallbackHandler):
+    """Notes whether a model call has already streamed text to the caller's callbacks"""
+
+    def __init__(self):
+        self.emitted = False
+
+    async def on_llm_new_token(self, token: str, **kwargs) -> None:
+        if token:
+            self.emitted = True
+
+
+class TokenBucket:
+    """Async token-bucket rate limiter"""
+
+    def __init__(self, rate_per_second: float, burst: int, max_wait_seconds: float):
+        self.rate = rate_per_second
+        self.burst = burst
+        self.max_wait_seconds = max_wait_seconds
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Take one token, waiting for a refill if needed"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve the token now; a negative balance is the debt later callers wait out
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            if wait > self.max_wait_seconds:
+                self._tokens += 1
+                raise RateLimitedError(f"Model rate limit reached; would wait {wait:.1f}s")
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class LLMGateway:
+    """
+    Shared entry point for every model call.
+
+    Applies a global and a per-node concurrency limit, a token-bucket rate
+    limit, and a bounded wait queue that rejects calls fast when full.
+    Identical prompts already in flight are coalesced into one provider call,
+    except answers streamed to the caller: a shared call would stream its
+    tokens only to the callbacks of the caller that started it.
+    Each call then runs under its node's CallPolicy: a per-attempt timeout,
+    retries with full-jitter exponential backoff for transient errors, and
+    optionally a hedged duplicate fired once the node's p95 latency elapses.
+    A call that has already streamed tokens (e.g. to /chat/stream) is never
+    retried, since the retry would send them again.
+    """
+
+    def __init__(
+        self,
+        llm_factory: Callable[..., Any],
+        max_concurrency: int = config.LLM_MAX_CONCURRENCY,
+        node_concurrency: Optional[Dict[str, int]] = None,
+        rate_per_second: float = config.LLM_RATE_PER_SECOND,
+        burst: int = config.LLM_RATE_BURST,
+        max_queue: int = config.LLM_MAX_QUEUE,
+        max_rate_wait_seconds: float = config.LLM_MAX_RATE_WAIT_SECONDS,
+        call_policies: Optional[Dict[str, CallPolicy]] = None
+    ):
+        self.llm_factory = llm_factory
+        self.max_queue = max_queue
+        self.node_concurrency = node_concurrency if node_concurrency is not None else config.LLM_NODE_CONCURRENCY
+        self._llms: Dict[Optional[str], Any] = {}
+        self._runnables: Dict[tuple, Any] = {}
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._node_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._rate_limiter = TokenBucket(rate_per_second, burst, max_rate_wait_seconds)
+        self._in_flight: Dict[tuple, asyncio.Task] = {}
+        self._waiters: Dict[tuple, int] = {}
+        self._waiting = 0
+        self._running = 0
+        self._calls = 0
+        self._coalesced = 0
+        self._rejected = 0
+        self._rate_limited = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self.call_policies = call_policies if call_policies is not None else load_call_policies(
+            config.LLM_CALL_POLICIES
+        )
+        self._latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=200))
+        self._retries = 0
+        self._timeouts = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+        LLM_QUEUE_DEPTH.set_function(lambda: self._waiting)
+        LLM_IN_FLIGHT.set_function(lambda: self._running)
+        # Build the default model up front so configuration errors surface at startup
+        self.get_llm()
+
+    def get_llm(self, model: Optional[str] = None):
+        """Get the chat model for a model name, creating it on first use"""
+        if model not in self._llms:
+            self._llms[model] = self.llm_factory(model) if model else self.llm_factory()
+        return self._llms[model]
+
+    def bind(self, schema=None, model: Optional[str] = None):
+        """Get the runnable for a model and output schema, building it on first use"""
+        key = (model, schema)
+        runnable = self._runnables.get(key)
+        if runnable is None:
+            llm = self.get_llm(model)
+            runnable = llm.with_structured_output(schema) if schema is not None else llm
+            self._runnables[key] = runnable
+        return runnable
+
+    def _node_semaphore(self, node: str) -> Optional[asyncio.Semaphore]:
+        limit = self.node_concurrency.get(node)
+        if not limit:
+            return None
+        if node not in self._node_semaphores:
+            self._node_semaphores[node] = asyncio.Semaphore(limit)
+        return self._node_semaphores[node]
+
+    @staticmethod
+    def _key(messages: list, schema, model: Optional[str]) -> tuple:
+        schema_name = schema.__name__ if schema is not None else None
+        return model, schema_name, json.dumps(messages, sort_keys=True, default=str)
+
+    async def ainvoke(self, messages: list, node: str = "default", schema=None, model: Optional[str] = None):
+        """Invoke the model (with structured output if a schema is given) through the gateway"""
+        # Streamed answers reach only the callbacks of the call's own context, so each caller makes its own
+        if schema is None and streams_tokens(ensure_config()):
+            return await self._call(messages, node, schema, model)
+        key = self._key(messages, schema, model)
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._coalesced += 1
+        else:
+            task = asyncio.create_task(self._call(messages, node, schema, model))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            # Shield so one caller disconnecting does not cancel the call for the others
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # ...but once nobody is waiting (e.g. a discarded speculative draft), stop the call
+            if self._waiters[key] == 1:
+                task.cancel()
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+    async def _call(self, messages: list, node: str, schema, model: Optional[str]):
+        if self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise GatewaySaturatedError("Too many model calls queued; try again shortly")
+
+        node_semaphore = self._node_semaphore(node)
+        start = time.perf_counter()
+        self._waiting += 1
+        acquired = []
+        try:
+            if node_semaphore is not None:
+                await node_semaphore.acquire()
+                acquired.append(node_semaphore)
+            await self._global.acquire()
+            acquired.append(self._global)
+            try:
+                await self._rate_limiter.acquire()
+            except RateLimitedError:
+                self._rate_limited += 1
+                raise
+        except BaseException:
+            self._waiting -= 1
+            for semaphore in acquired:
+                semaphore.release()
+            raise
+
+        waited = time.perf_counter() - start
+        self._waiting -= 1
+        self._running += 1
+        self._calls += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        LLM_QUEUE_WAIT.labels(node).observe(waited)
+        try:
+            return await self._invoke_with_policy(self.bind(schema, model), messages, node)
+        finally:
+            self._running -= 1
+            for semaphore in acquired:
+                semaphore.release()
+
+    def policy_for(self, node: str) -> CallPolicy:
+        """Get the call policy of a node"""
+        return self.call_policies.get(node) or self.call_policies.get("default") or CallPolicy()
+
+    def _p95(self, node: str) -> Optional[float]:
+        latencies = self._latencies[node]
+        if len(latencies) < 20:
+            return None
+        return sorted(latencies)[int(len(latencies) * 0.95)]
+
+    async def _attempt(self, runnable, messages: list, node: str, policy: CallPolicy, run_config: RunnableConfig):
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(runnable.ainvoke(messages, run_config), policy.timeout_seconds)
+        except TimeoutError:
+            self._timeouts += 1
+            raise
+        latency = time.perf_counter() - start
+        self._latencies[node].append(latency)
+        LLM_CALL_LATENCY.labels(node).observe(latency)
+        return result
+
+    async def _hedged(self, runnable, messages: list, node: str, policy: CallPolicy, run_config: RunnableConfig):
+        """Run one attempt, firing a duplicate if it outlives the hedge delay"""
+        if not policy.hedge:
+            return await self._attempt(runnable, messages, node, policy, run_config)
+
+        primary = asyncio.create_task(self._attempt(runnable, messages, node, policy, run_config))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self._p95(node) or policy.hedge_delay_seconds)
+            if done:
+                return primary.result()
+
+            self._hedges += 1
+            backup = asyncio.create_task(self._attempt(runnable, messages, node, policy, run_config))
+            pending.add(backup)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self._hedge_wins += 1
+                        return task.result()
+            # Both attempts failed; surface the primary's error
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _invoke_with_policy(self, runnable, messages: list, node: str):
+        policy = self.policy_for(node)
+        # Inherit the caller's callbacks (streaming events included) and watch for streamed output
+        watcher = _OutputWatcher()
+        run_config = merge_configs(ensure_config(), {"callbacks": [watcher]})
+        for attempt in range(policy.max_retries + 1):
+            try:
+                return await self._hedged(runnable, messages, node, policy, run_config)
+            except Exception as e:
+                # Once tokens have gone out, a retry would stream them a second time
+                if attempt == policy.max_retries or not is_transient(e) or watcher.emitted:
+                    if isinstance(e, TimeoutError):
+                        raise ModelTimeoutError(
+                            f"Model call for {node} timed out after {policy.timeout_seconds:g}s"
+                        ) from e
+                    raise
+                self._retries += 1
+                backoff = min(policy.backoff_max_seconds, policy.backoff_base_seconds * 2 ** attempt)
+                await asyncio.sleep(random.uniform(0, backoff))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth, wait time, shedding and straggler counters"""
+        return {
+            "queue_depth": self._waiting,
+            "in_flight": self._running,
+            "calls": self._calls,
+            "coalesced": self._coalesced,
+            "rejected": self._rejected,
+            "rate_limited": self._rate_limited,
+            "avg_wait_ms": self._wait_total / self._calls * 1000 if self._calls else 0.0,
+            "max_wait_ms": self._wait_max * 1000,
+            "retries": self._retries,
+            "timeouts": self._timeouts,
+            "hedges": self._hedges,
+            "hedge_wins": self._hedge_wins,
+            "p95_latency_ms": {
+                node: p95 * 1000 for node in list(self._latencies) if (p95 := self._p95(node)) is not None
+            }
+        }
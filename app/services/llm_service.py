@@ -1,14 +1,25 @@
+from functools import lru_cache
+import httpx
 from dotenv import load_dotenv
 from langchain.chat_models import init_chat_model
+from .. import config
 
 
 # Load credentials from environment
 load_dotenv()
 
-# Initialize the model with provider
-def get_llm():
+# Initialize the model with provider; one client (and connection pool) per model per process
+@lru_cache(maxsize=None)
+def get_llm(model: str = "gemini-2.5-flash"):
     """Get the initialized language model"""
+    limits = httpx.Limits(
+        max_connections=config.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.LLM_HTTP_MAX_CONNECTIONS
+    )
     return init_chat_model(
-        "gemini-2.5-flash",
-        model_provider="google_genai"
+        model,
+        model_provider="google_genai",
+        client_args={"limits": limits},
+        # Retries are owned by the gateway's call policies
+        max_retries=0
     )
@@ -1,148 +1,144 @@
-from typing import Dict, List, Any, Optional
-from datetime import datetime, timedelta
-import threading
-from ..models.schemas import ChatMessage
+import asyncio
+import logging
+import time
+from typing import Dict, List, Any, Optional, Tuple
+from .. import config
+from .metrics import SESSIONS
+from .session_store import HistoryPage, SessionStore, StoredMessage, create_session_store
 
 
-class SessionMemory:
-    """Memory management for individual sessions"""
-    
-    def __init__(self, session_id: str, max_messages: int = 50):
-        self.session_id = session_id
-        self.messages: List[ChatMessage] = []
-        self.max_messages = max_messages
-        self.created_at = datetime.now()
-        self.last_accessed = datetime.now()
-        self.metadata = {}
-    
-    def add_message(self, role: str, content: str) -> None:
-        """Add a message to the session memory"""
-        message = ChatMessage(
-            role=role,
-            content=content,
-            timestamp=datetime.now()
-        )
-        self.messages.append(message)
-        self.last_accessed = datetime.now()
-        
-        # Keep only the last max_messages
-        if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages:]
-    
-    def get_messages(self, limit: Optional[int] = None) -> List[ChatMessage]:
-        """Get messages from session memory"""
-        self.last_accessed = datetime.now()
-        if limit:
-            return self.messages[-limit:]
-        return self.messages.copy()
-    
-    def get_conversation_context(self, include_system: bool = False) -> List[Dict[str, str]]:
-        """Get conversation context in format suitable for LLM"""
-        context = []
-        for msg in self.messages:
-            if not include_system and msg.role == "system":
-                continue
-            context.append({
-                "role": msg.role,
-                "content": msg.content
-            })
-        return context
-    
-    def clear(self) -> None:
-        """Clear all messages from session"""
-        self.messages.clear()
-        self.last_accessed = datetime.now()
-    
-    def is_expired(self, ttl_hours: int = 24) -> bool:
-        """Check if session has expired"""
-        return datetime.now() - self.last_accessed > timedelta(hours=ttl_hours)
+logger = logging.getLogger(__name__)
 
 
 class MemoryService:
-    """Service for managing session-based conversation memory"""
-    
-    def __init__(self, session_ttl_hours: int = 24, max_sessions: int = 1000):
-        self.sessions: Dict[str, SessionMemory] = {}
+    """View over the session store that the workflow's checkpointer loads and saves conversations through"""
+    
+    def __init__(
+        self,
+        session_ttl_hours: int = config.SESSION_TTL_HOURS,
+        max_sessions: int = config.MAX_SESSIONS,
+        store: Optional[SessionStore] = None
+    ):
         self.session_ttl_hours = session_ttl_hours
         self.max_sessions = max_sessions
-        self._lock = threading.RLock()
-    
-    def get_session(self, session_id: str) -> SessionMemory:
-        """Get or create a session memory"""
-        with self._lock:
-            if session_id not in self.sessions:
-                self.sessions[session_id] = SessionMemory(session_id)
-                self._cleanup_expired_sessions()
-            
-            return self.sessions[session_id]
-    
-    def add_message(self, session_id: str, role: str, content: str) -> None:
-        """Add a message to session memory"""
-        session = self.get_session(session_id)
-        session.add_message(role, content)
-    
-    def get_conversation_context(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, str]]:
-        """Get conversation context for a session"""
-        session = self.get_session(session_id)
-        return session.get_conversation_context()[-limit:] if limit else session.get_conversation_context()
-    
-    def get_messages(self, session_id: str, limit: Optional[int] = None) -> List[ChatMessage]:
-        """Get messages from a session"""
-        session = self.get_session(session_id)
-        return session.get_messages(limit)
+        self.store = store or create_session_store(
+            config.SESSION_STORE,
+            session_ttl_hours=session_ttl_hours,
+            max_sessions=max_sessions,
+            max_messages=config.MAX_SESSION_MESSAGES,
+            path=config.SESSION_DB_PATH,
+            num_shards=config.SESSION_SHARDS,
+            snapshot_path=config.SESSION_SNAPSHOT_FILE
+        )
+        self._sweeper: Optional[asyncio.Task] = None
+        self._snapshotter: Optional[asyncio.Task] = None
+        SESSIONS.set_function(self.store.count_sessions)
+        self.load_snapshot()
+    
+    def get_metadata(self, session_id: str) -> Dict[str, Any]:
+        """Get a session's metadata without creating the session"""
+        return self.store.get_metadata(session_id)
+    
+    def update_metadata(self, session_id: str, values: Dict[str, Any]) -> bool:
+        """Merge values into a session's metadata"""
+        return self.store.update_metadata(session_id, values)
+    
+    def get_messages(self, session_id: str, limit: Optional[int] = None) -> List[StoredMessage]:
+        """Get messages from a session in their compact stored form"""
+        return self.store.get_messages(session_id, limit)
+    
+    def get_history(
+        self, session_id: str, limit: Optional[int] = None, before: Optional[int] = None, after: Optional[int] = None
+    ) -> Optional[HistoryPage]:
+        """Get a page of a session's messages by sequence-number cursor, or None if the session does not exist"""
+        return self.store.get_history(session_id, limit, before, after)
+    
+    def get_history_version(self, session_id: str) -> Optional[str]:
+        """Get a token that changes whenever a session's messages change, or None if the session does not exist"""
+        return self.store.get_history_version(session_id)
     
     def clear_session(self, session_id: str) -> bool:
         """Clear a specific session"""
-        with self._lock:
-            if session_id in self.sessions:
-                self.sessions[session_id].clear()
-                return True
-            return False
+        return self.store.clear_session(session_id)
     
     def delete_session(self, session_id: str) -> bool:
         """Delete a session completely"""
-        with self._lock:
-            if session_id in self.sessions:
-                del self.sessions[session_id]
-                return True
-            return False
+        return self.store.delete_session(session_id)
     
     def get_active_sessions(self) -> List[str]:
         """Get list of active session IDs"""
-        with self._lock:
-            return list(self.sessions.keys())
+        return self.store.list_sessions()
+    
+    def list_sessions_page(
+        self, limit: int, before: Optional[str] = None, after: Optional[str] = None
+    ) -> Tuple[List[str], bool]:
+        """Get a page of session IDs by session-ID cursor, plus whether more lie beyond it"""
+        return self.store.list_sessions_page(limit, before, after)
+    
+    def count_sessions(self) -> int:
+        """Count sessions without listing them"""
+        return self.store.count_sessions()
     
     def get_session_stats(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get statistics for a session"""
-        if session_id not in self.sessions:
-            return None
-        
-        session = self.sessions[session_id]
-        return {
-            "session_id": session_id,
-            "message_count": len(session.messages),
-            "created_at": session.created_at.isoformat(),
-            "last_accessed": session.last_accessed.isoformat(),
-            "is_expired": session.is_expired(self.session_ttl_hours)
-        }
-    
-    def _cleanup_expired_sessions(self) -> None:
-        """Clean up expired sessions"""
-        with self._lock:
-            expired_sessions = [
-                session_id for session_id, session in self.sessions.items()
-                if session.is_expired(self.session_ttl_hours)
-            ]
-            
-            for session_id in expired_sessions:
-                del self.sessions[session_id]
-            
-            # If we still have too many sessions, remove oldest ones
-            if len(self.sessions) > self.max_sessions:
-                sorted_sessions = sorted(
-                    self.sessions.items(),
-                    key=lambda x: x[1].last_accessed
-                )
-                sessions_to_remove = len(self.sessions) - self.max_sessions
-                for session_id, _ in sorted_sessions[:sessions_to_remove]:
-                    del self.sessions[session_id]
+        return self.store.get_session_stats(session_id)
+    
+    def start_sweeper(self, interval_seconds: float = config.SESSION_SWEEP_INTERVAL_SECONDS) -> None:
+        """Start the background task that expires idle sessions off the request path"""
+        if self._sweeper is None:
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep(interval_seconds))
+    
+    async def _sweep(self, interval_seconds: float) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await asyncio.to_thread(self.store.cleanup_expired)
+            except Exception:
+                logger.exception("session sweep failed")
+    
+    def load_snapshot(self) -> None:
+        """Register the sessions of the last snapshot; each is decoded on first access"""
+        start = time.perf_counter()
+        try:
+            registered = self.store.load_snapshot()
+        except (OSError, ValueError):
+            logger.exception("session snapshot could not be loaded", extra={"path": self.store.snapshot_path})
+            return
+        if registered:
+            logger.info("session snapshot loaded", extra={
+                "sessions": registered, "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+            })
+    
+    def save_snapshot(self) -> None:
+        """Snapshot all sessions if any changed since the last snapshot"""
+        start = time.perf_counter()
+        written = self.store.save_snapshot()
+        if written is not None:
+            logger.info("session snapshot written", extra={
+                "sessions": written, "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+            })
+    
+    def start_snapshots(self, interval_seconds: float = config.SESSION_SNAPSHOT_INTERVAL_SECONDS) -> None:
+        """Start the background task that snapshots sessions periodically, if the store keeps snapshots"""
+        if self._snapshotter is None and self.store.snapshot_path:
+            self._snapshotter = asyncio.get_running_loop().create_task(self._snapshot(interval_seconds))
+    
+    async def _snapshot(self, interval_seconds: float) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await asyncio.to_thread(self.save_snapshot)
+            except Exception:
+                logger.exception("session snapshot failed")
+    
+    def close(self) -> None:
+        """Stop background tasks, take a final snapshot and release the storage backend"""
+        for task in (self._sweeper, self._snapshotter):
+            if task is not None:
+                task.cancel()
+        self._sweeper = self._snapshotter = None
+        try:
+            self.save_snapshot()
+        except Exception:
+            logger.exception("session snapshot failed")
+        self.store.close()
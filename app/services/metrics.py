@@ -0,0 +1,102 @@
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from .. import config
+
+
+# Buckets span local work (sub-millisecond) up to slow model answers
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LOCK_BUCKETS = (0.00001, 0.0001, 0.001, 0.01, 0.1, 1)
+
+REQUEST_LATENCY = Histogram(
+    "chat_request_latency_seconds", "End-to-end workflow latency per request", ["mode"],
+    buckets=LATENCY_BUCKETS
+)
+HTTP_LATENCY = Histogram(
+    "chat_http_request_latency_seconds", "HTTP request latency until the response starts",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+NODE_LATENCY = Histogram(
+    "chat_node_latency_seconds", "Latency of each workflow node", ["node"], buckets=LATENCY_BUCKETS
+)
+LLM_CALL_LATENCY = Histogram(
+    "chat_llm_call_latency_seconds", "Latency of each model call attempt", ["node"], buckets=LATENCY_BUCKETS
+)
+LLM_QUEUE_WAIT = Histogram(
+    "chat_llm_queue_wait_seconds", "Time model calls waited in the gateway for a slot", ["node"],
+    buckets=LATENCY_BUCKETS
+)
+LLM_QUEUE_DEPTH = Gauge("chat_llm_queue_depth", "Model calls waiting in the gateway for a slot")
+LLM_IN_FLIGHT = Gauge("chat_llm_in_flight", "Model calls the gateway is running")
+LLM_TOKENS = Counter("chat_llm_tokens_total", "Model tokens used by agent answers", ["course", "kind"])
+LLM_COST = Counter("chat_llm_cost_usd_total", "Estimated model cost of agent answers in USD", ["course"])
+SPECULATIONS = Counter(
+    "chat_speculation_total", "Speculative agent drafts by outcome (hit: committed, miss: discarded)", ["outcome"]
+)
+SPECULATION_SAVED = Counter(
+    "chat_speculation_saved_seconds_total", "Latency saved by committed speculative drafts"
+)
+SESSIONS = Gauge("chat_sessions", "Sessions held by the session store")
+LOCK_WAIT = Histogram(
+    "chat_memory_lock_wait_seconds", "Time spent waiting on contended session-store shard locks",
+    buckets=LOCK_BUCKETS
+)
+
+
+def timed_node(node: str, fn: Callable) -> Callable:
+    """Wrap an async workflow node so its latency is recorded under its node name"""
+    histogram = NODE_LATENCY.labels(node)
+
+    @functools.wraps(fn)
+    async def wrapper(state):
+        start = time.perf_counter()
+        try:
+            return await fn(state)
+        finally:
+            histogram.observe(time.perf_counter() - start)
+    return wrapper
+
+
+def record_usage(course: str, usage: Optional[Dict[str, Any]]) -> None:
+    """Count the tokens and estimated cost of one agent answer"""
+    if not usage:
+        return
+    input_tokens = usage.get("input_tokens", 0)
+    output_tokens = usage.get("output_tokens", 0)
+    cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+    LLM_TOKENS.labels(course, "input").inc(input_tokens)
+    LLM_TOKENS.labels(course, "output").inc(output_tokens)
+    LLM_TOKENS.labels(course, "cached").inc(cached)
+    cost = (
+        (input_tokens - cached) * config.LLM_PRICE_INPUT_PER_MTOK
+        + cached * config.LLM_PRICE_CACHED_PER_MTOK
+        + output_tokens * config.LLM_PRICE_OUTPUT_PER_MTOK
+    ) / 1_000_000
+    LLM_COST.labels(course).inc(cost)
+
+
+def render() -> tuple:
+    """Render every metric in the Prometheus text format, with its content type"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class TimedLock:
+    """threading.Lock that records how long contended acquisitions waited"""
+
+    __slots__ = ("_lock",)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        # Uncontended acquisitions take the fast path and are not observed
+        if not self._lock.acquire(blocking=False):
+            start = time.perf_counter()
+            self._lock.acquire()
+            LOCK_WAIT.observe(time.perf_counter() - start)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
@@ -0,0 +1,59 @@
+import mmap
+import os
+import struct
+from typing import Iterable, List, Tuple
+import ormsgpack
+
+
+MAGIC = b"CSNAP001"
+# Trailer: offset and length of the index, then the magic again
+_TRAILER = struct.Struct("<QQ8s")
+
+
+def write_snapshot(path: str, records: Iterable[Tuple[str, float, bytes]]) -> int:
+    """
+    Write (session_id, last_accessed, record) entries to a new snapshot file and fsync it.
+
+    Records are streamed to the file, followed by an index of
+    [last_accessed, session_id, offset, length] entries sorted least recently
+    used first. Callers write to a temporary path and os.replace it over the
+    live snapshot once every map of that snapshot is closed (Windows refuses
+    to replace a mapped file). Returns the number of sessions written.
+    """
+    index = []
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        offset = len(MAGIC)
+        for session_id, last_accessed, record in records:
+            f.write(record)
+            index.append((last_accessed, session_id, offset, len(record)))
+            offset += len(record)
+        index.sort()
+        packed = ormsgpack.packb(index)
+        f.write(packed)
+        f.write(_TRAILER.pack(offset, len(packed), MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+    return len(index)
+
+
+class SnapshotFile:
+    """A memory-mapped session snapshot: the index is decoded on open, session records only when read"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < len(MAGIC) + _TRAILER.size or self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a session snapshot: {path}")
+        index_offset, index_length, magic = _TRAILER.unpack_from(self._map, len(self._map) - _TRAILER.size)
+        if magic != MAGIC:
+            raise ValueError(f"Truncated session snapshot: {path}")
+        self.index: List[list] = ormsgpack.unpackb(self._map[index_offset:index_offset + index_length])
+
+    def read(self, offset: int, length: int) -> bytes:
+        """Get the raw bytes of one session record"""
+        return self._map[offset:offset + length]
+
+    def close(self) -> None:
+        """Unmap the file so it can be replaced or deleted"""
+        self._map.close()
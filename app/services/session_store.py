@@ -0,0 +1,898 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from contextlib import ExitStack
+from itertools import islice
+from typing import Deque, Dict, List, Any, NamedTuple, Optional, Tuple
+from datetime import datetime
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import ormsgpack
+from sortedcontainers import SortedList
+from .metrics import TimedLock
+from .session_snapshot import SnapshotFile, write_snapshot
+from .tokenizer import estimate_tokens
+
+
+class StoredMessage(NamedTuple):
+    """Compact stored form of a chat message; converted to ChatMessage only at the API boundary"""
+    role: str
+    content: str
+    timestamp: float
+    tokens: int
+    seq: int
+
+
+class HistoryPage(NamedTuple):
+    """One page of a session's messages, oldest first"""
+    messages: List[StoredMessage]
+    # Messages the session currently holds
+    total: int
+    # Whether more messages lie beyond this page in the direction being paged
+    has_more: bool
+
+
+def pack_stable_window(
+    messages: List[StoredMessage], token_budget: int, after_seq: int, refill_fraction: float
+) -> Tuple[List[Dict[str, str]], int]:
+    """
+    Pack conversation messages (oldest first, all from after_seq on) into a window with a stable start.
+
+    While everything since after_seq fits the budget the window only grows, so
+    consecutive prompts share a byte-identical prefix that provider-side prompt
+    caching can reuse. Once it overflows, the window restarts from the newest
+    messages filling refill_fraction of the budget. Returns the window and the
+    sequence number it starts at, which the caller passes back as after_seq.
+    """
+    if sum(msg.tokens for msg in messages) <= token_budget:
+        kept = messages
+    else:
+        kept = []
+        used = 0
+        for msg in reversed(messages):
+            used += msg.tokens
+            if used > token_budget * refill_fraction:
+                break
+            kept.append(msg)
+        kept.reverse()
+
+    if kept:
+        start = kept[0].seq
+    else:
+        start = messages[-1].seq + 1 if messages else after_seq
+    return [{"role": msg.role, "content": msg.content} for msg in kept], start
+
+
+class SessionMemory:
+    """Memory management for individual sessions"""
+
+    __slots__ = ("session_id", "messages", "next_seq", "created_at", "last_accessed", "metadata", "_lock")
+
+    def __init__(self, session_id: str, max_messages: int = 50):
+        self.session_id = session_id
+        # Ring buffer: appending past max_messages drops the oldest message
+        self.messages: Deque[StoredMessage] = deque(maxlen=max_messages)
+        # Monotonic per-session sequence number of the next message
+        self.next_seq = 0
+        self.created_at = time.time()
+        self.last_accessed = self.created_at
+        self.metadata = {}
+        # Guards message mutation; held only for the duration of a single operation
+        self._lock = threading.Lock()
+
+    @property
+    def max_messages(self) -> int:
+        return self.messages.maxlen
+
+    def to_record(self) -> bytes:
+        """Encode the session for a snapshot; sequence numbers are contiguous, so only the first is kept"""
+        with self._lock:
+            first_seq = self.messages[0].seq if self.messages else self.next_seq
+            return ormsgpack.packb([
+                self.created_at, self.last_accessed, self.next_seq, self.metadata, first_seq,
+                [msg[:4] for msg in self.messages]
+            ])
+
+    @classmethod
+    def from_record(cls, session_id: str, max_messages: int, record: bytes) -> "SessionMemory":
+        """Decode a session written by to_record"""
+        created_at, last_accessed, next_seq, metadata, first_seq, messages = ormsgpack.unpackb(record)
+        session = cls(session_id, max_messages)
+        session.created_at = created_at
+        session.last_accessed = last_accessed
+        session.next_seq = next_seq
+        session.metadata = metadata
+        session.messages.extend(
+            StoredMessage(sys.intern(role), content, timestamp, tokens, first_seq + i)
+            for i, (role, content, timestamp, tokens) in enumerate(messages)
+        )
+        return session
+
+    def add_messages(self, messages: List[Tuple[str, str]]) -> None:
+        """Add several messages atomically, keeping them contiguous"""
+        now = time.time()
+        with self._lock:
+            for role, content in messages:
+                self.messages.append(StoredMessage(
+                    sys.intern(role), content, now, estimate_tokens(content), self.next_seq
+                ))
+                self.next_seq += 1
+
+    def get_messages(self, limit: Optional[int] = None) -> List[StoredMessage]:
+        """Get messages from session memory"""
+        with self._lock:
+            if limit:
+                return list(islice(reversed(self.messages), limit))[::-1]
+            return list(self.messages)
+
+    def get_messages_since(self, start_seq: int) -> List[StoredMessage]:
+        """Get all messages from start_seq on, oldest first"""
+        with self._lock:
+            return [msg for msg in self.messages if msg.seq >= start_seq]
+
+    def get_page(self, limit: Optional[int] = None, before: Optional[int] = None, after: Optional[int] = None) -> HistoryPage:
+        """
+        Get the messages with after < seq < before without copying the rest of the buffer.
+
+        Sequence numbers in the buffer are contiguous, so the bounds become
+        indexes directly. With more than limit matches, paging with after
+        returns the oldest of them and otherwise the newest.
+        """
+        with self._lock:
+            total = len(self.messages)
+            first_seq = self.messages[0].seq if total else self.next_seq
+            start = 0 if after is None else min(max(after + 1 - first_seq, 0), total)
+            end = total if before is None else min(max(before - first_seq, start), total)
+            has_more = bool(limit) and end - start > limit
+            if has_more:
+                if after is not None:
+                    end = start + limit
+                else:
+                    start = end - limit
+            return HistoryPage(list(islice(self.messages, start, end)), total, has_more)
+
+    def version(self) -> str:
+        """Token that changes whenever the session's messages change"""
+        return f"{self.created_at!r}:{self.next_seq}:{len(self.messages)}"
+
+    def clear(self) -> None:
+        """Clear all messages and derived metadata from session"""
+        with self._lock:
+            self.messages.clear()
+            self.metadata = {}
+
+    def is_expired(self, ttl_hours: int = 24) -> bool:
+        """Check if session has expired"""
+        return time.time() - self.last_accessed > ttl_hours * 3600
+
+
+class SessionStore(ABC):
+    """Storage backend interface behind MemoryService"""
+
+    # Where a non-durable backend snapshots its sessions for a warm restart
+    snapshot_path: Optional[str] = None
+
+    def __init__(self, session_ttl_hours: int = 24, max_sessions: int = 1000, max_messages: int = 50):
+        self.session_ttl_hours = session_ttl_hours
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+
+    @abstractmethod
+    def append_messages(self, session_id: str, messages: List[Tuple[str, str]]) -> None:
+        """Append (role, content) pairs to a session, creating it if needed"""
+
+    @abstractmethod
+    def get_messages(self, session_id: str, limit: Optional[int] = None) -> List[StoredMessage]:
+        """Get the most recent messages of a session, oldest first"""
+
+    @abstractmethod
+    def get_history(
+        self, session_id: str, limit: Optional[int] = None, before: Optional[int] = None, after: Optional[int] = None
+    ) -> Optional[HistoryPage]:
+        """Get a page of messages with after < seq < before, or None if the session does not exist (see SessionMemory.get_page)"""
+
+    @abstractmethod
+    def get_history_version(self, session_id: str) -> Optional[str]:
+        """Get a token that changes whenever a session's messages change, or None if the session does not exist"""
+
+    @abstractmethod
+    def get_messages_since(self, session_id: str, start_seq: int) -> Optional[List[StoredMessage]]:
+        """Get a session's messages from start_seq on, or None (without creating it) if the session does not exist"""
+
+    @abstractmethod
+    def get_metadata(self, session_id: str) -> Dict[str, Any]:
+        """Get a copy of a session's metadata (empty if the session does not exist)"""
+
+    @abstractmethod
+    def update_metadata(self, session_id: str, values: Dict[str, Any]) -> bool:
+        """Merge values into an existing session's metadata"""
+
+    @abstractmethod
+    def clear_session(self, session_id: str) -> bool:
+        """Remove all messages from a session"""
+
+    @abstractmethod
+    def delete_session(self, session_id: str) -> bool:
+        """Delete a session completely"""
+
+    @abstractmethod
+    def list_sessions(self) -> List[str]:
+        """List the IDs of stored sessions"""
+
+    @abstractmethod
+    def list_sessions_page(
+        self, limit: int, before: Optional[str] = None, after: Optional[str] = None
+    ) -> Tuple[List[str], bool]:
+        """
+        List session IDs with after < ID < before in ID order, plus whether more lie beyond the page.
+
+        Like history pages, paging with after returns the first matches and otherwise the last.
+        """
+
+    @abstractmethod
+    def count_sessions(self) -> int:
+        """Count stored sessions without listing them"""
+
+    @abstractmethod
+    def get_session_stats(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get statistics for a session, or None if it does not exist"""
+
+    @abstractmethod
+    def cleanup_expired(self) -> None:
+        """Remove expired sessions and enforce max_sessions (run by the background sweeper)"""
+
+    def load_snapshot(self) -> int:
+        """Register the sessions of the last snapshot for restore; returns how many were registered"""
+        return 0
+
+    def save_snapshot(self) -> Optional[int]:
+        """Snapshot sessions if anything changed; returns the number written, or None if skipped"""
+        return None
+
+    def close(self) -> None:
+        """Release backend resources"""
+
+
+class _SnapshottedSession(NamedTuple):
+    """A session still in the snapshot file; decoded into a SessionMemory on first access"""
+    snapshot: SnapshotFile
+    offset: int
+    length: int
+    last_accessed: float
+
+    def is_expired(self, ttl_hours: int = 24) -> bool:
+        return time.time() - self.last_accessed > ttl_hours * 3600
+
+    def read(self) -> bytes:
+        return self.snapshot.read(self.offset, self.length)
+
+
+class _Shard:
+    """One stripe of the in-memory store: an access-ordered dict, a sorted ID index and their lock"""
+
+    def __init__(self, max_messages: int):
+        # Values are _SnapshottedSession until a session restored from a snapshot is first accessed
+        self.sessions: "OrderedDict[str, SessionMemory]" = OrderedDict()
+        # Session IDs in sorted order, for cursor pagination; inserts and deletes are O(log n)
+        self.ids = SortedList()
+        self.max_messages = max_messages
+        self.lock = TimedLock()
+
+    def get(self, session_id: str) -> Optional[SessionMemory]:
+        """Get a session, decoding it from the snapshot on first access; the caller holds the lock"""
+        session = self.sessions.get(session_id)
+        if isinstance(session, _SnapshottedSession):
+            session = SessionMemory.from_record(session_id, self.max_messages, session.read())
+            self.sessions[session_id] = session
+        return session
+
+    def touch(self, session: SessionMemory) -> None:
+        """Mark a session most recently used; the caller holds the lock, so access order matches last_accessed"""
+        self.sessions.move_to_end(session.session_id)
+        session.last_accessed = time.time()
+
+    def add(self, session: SessionMemory) -> None:
+        self.sessions[session.session_id] = session
+        self.ids.add(session.session_id)
+
+    def remove(self, session_id: str) -> Optional[SessionMemory]:
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            self.ids.remove(session_id)
+        return session
+
+    def pop_oldest(self) -> None:
+        session_id, _ = self.sessions.popitem(last=False)
+        self.ids.remove(session_id)
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local session store (default).
+
+    Sessions are striped across shards by session-id hash so that unrelated
+    sessions never contend for the same lock. Within a shard sessions are kept
+    in access order, least recently used first, so touching a session is O(1)
+    and expiry and eviction only have to look at the front. max_sessions caps
+    the whole store: a new session beyond it evicts the least recently used
+    session of all shards, found by comparing the shards' fronts. Each shard also keeps its session IDs in a
+    SortedList, so creating or evicting a session costs O(log n) and a page of
+    the session listing is a bisect per shard.
+    Reads never create sessions; only appends do. Reading a session's
+    messages marks it recently used, like an append; history pages and stats
+    do not.
+
+    With a snapshot_path, sessions can be snapshotted to a compact binary file
+    (see session_snapshot) and restored after a restart. Loading a snapshot
+    only decodes its index; each session is decoded from the memory-mapped
+    file when it is first accessed.
+    """
+
+    def __init__(
+        self,
+        session_ttl_hours: int = 24,
+        max_sessions: int = 1000,
+        max_messages: int = 50,
+        num_shards: int = 16,
+        snapshot_path: Optional[str] = None
+    ):
+        super().__init__(session_ttl_hours, max_sessions, max_messages)
+        self._shards = [_Shard(max_messages) for _ in range(num_shards)]
+        # Serializes evictions, so concurrent creators never evict more than the excess
+        self._evict_lock = threading.Lock()
+        self.snapshot_path = snapshot_path
+        self._snapshot_lock = threading.Lock()
+        # The mapped snapshot that sessions not yet restored are read from
+        self._snapshot: Optional[SnapshotFile] = None
+        # Set by every write; a snapshot is skipped when nothing changed since the last one
+        self._dirty = False
+
+    def _shard(self, session_id: str) -> _Shard:
+        return self._shards[hash(session_id) % len(self._shards)]
+
+    def get_session(self, session_id: str) -> SessionMemory:
+        """Get or create a session memory, marking it most recently used"""
+        shard = self._shard(session_id)
+        with shard.lock:
+            session = shard.get(session_id)
+            if session is not None:
+                shard.touch(session)
+                return session
+            session = SessionMemory(session_id, self.max_messages)
+            shard.add(session)
+
+        if self.count_sessions() > self.max_sessions:
+            self._evict_over_capacity()
+        return session
+
+    def _evict_over_capacity(self) -> None:
+        """Evict least recently used sessions until the store is back within max_sessions"""
+        with self._evict_lock:
+            while self.count_sessions() > self.max_sessions:
+                # Each shard's front is its least recently used session; evict the oldest of those
+                oldest, oldest_shard = None, None
+                for shard in self._shards:
+                    with shard.lock:
+                        if shard.sessions:
+                            last_accessed = next(iter(shard.sessions.values())).last_accessed
+                            if oldest is None or last_accessed < oldest:
+                                oldest, oldest_shard = last_accessed, shard
+                if oldest_shard is None:
+                    return
+                with oldest_shard.lock:
+                    if oldest_shard.sessions:
+                        oldest_shard.pop_oldest()
+                self._dirty = True
+
+    def _touch_session(self, session_id: str) -> Optional[SessionMemory]:
+        """Get a session without creating it, marking it most recently used"""
+        shard = self._shard(session_id)
+        with shard.lock:
+            session = shard.get(session_id)
+            if session is not None:
+                shard.touch(session)
+            return session
+
+    def find_session(self, session_id: str) -> Optional[SessionMemory]:
+        """Get a session without creating it or changing its recency"""
+        shard = self._shard(session_id)
+        with shard.lock:
+            return shard.get(session_id)
+
+    def append_messages(self, session_id: str, messages: List[Tuple[str, str]]) -> None:
+        self.get_session(session_id).add_messages(messages)
+        self._dirty = True
+
+    def get_messages(self, session_id: str, limit: Optional[int] = None) -> List[StoredMessage]:
+        session = self._touch_session(session_id)
+        return session.get_messages(limit) if session else []
+
+    def get_history(
+        self, session_id: str, limit: Optional[int] = None, before: Optional[int] = None, after: Optional[int] = None
+    ) -> Optional[HistoryPage]:
+        session = self.find_session(session_id)
+        return session.get_page(limit, before, after) if session else None
+
+    def get_history_version(self, session_id: str) -> Optional[str]:
+        session = self.find_session(session_id)
+        return session.version() if session else None
+
+    def get_messages_since(self, session_id: str, start_seq: int) -> Optional[List[StoredMessage]]:
+        session = self._touch_session(session_id)
+        return session.get_messages_since(start_seq) if session else None
+
+    def get_metadata(self, session_id: str) -> Dict[str, Any]:
+        session = self.find_session(session_id)
+        return dict(session.metadata) if session else {}
+
+    def update_metadata(self, session_id: str, values: Dict[str, Any]) -> bool:
+        session = self.find_session(session_id)
+        if session is None:
+            return False
+        session.metadata = {**session.metadata, **values}
+        self._dirty = True
+        return True
+
+    def clear_session(self, session_id: str) -> bool:
+        shard = self._shard(session_id)
+        with shard.lock:
+            session = shard.get(session_id)
+            if session is None:
+                return False
+            shard.touch(session)
+        session.clear()
+        self._dirty = True
+        return True
+
+    def delete_session(self, session_id: str) -> bool:
+        shard = self._shard(session_id)
+        with shard.lock:
+            deleted = shard.remove(session_id) is not None
+        self._dirty = self._dirty or deleted
+        return deleted
+
+    def list_sessions(self) -> List[str]:
+        session_ids = []
+        for shard in self._shards:
+            with shard.lock:
+                session_ids.extend(shard.sessions.keys())
+        return session_ids
+
+    def list_sessions_page(
+        self, limit: int, before: Optional[str] = None, after: Optional[str] = None
+    ) -> Tuple[List[str], bool]:
+        # Take up to limit + 1 IDs from each shard's sorted index, then merge
+        candidates = []
+        for shard in self._shards:
+            with shard.lock:
+                start = 0 if after is None else shard.ids.bisect_right(after)
+                end = len(shard.ids) if before is None else max(shard.ids.bisect_left(before), start)
+                if after is not None:
+                    candidates.extend(shard.ids.islice(start, min(end, start + limit + 1)))
+                else:
+                    candidates.extend(shard.ids.islice(max(start, end - limit - 1), end))
+        candidates.sort()
+        page = candidates[:limit + 1] if after is not None else candidates[-limit - 1:]
+        has_more = len(page) > limit
+        if has_more:
+            page = page[:limit] if after is not None else page[1:]
+        return page, has_more
+
+    def count_sessions(self) -> int:
+        return sum(len(shard.sessions) for shard in self._shards)
+
+    def get_session_stats(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session = self.find_session(session_id)
+        if session is None:
+            return None
+
+        return {
+            "session_id": session_id,
+            "message_count": len(session.messages),
+            "created_at": datetime.fromtimestamp(session.created_at).isoformat(),
+            "last_accessed": datetime.fromtimestamp(session.last_accessed).isoformat(),
+            "is_expired": session.is_expired(self.session_ttl_hours)
+        }
+
+    def cleanup_expired(self) -> None:
+        # The least recently used session is always first, so stop at the first live one
+        for shard in self._shards:
+            with shard.lock:
+                while shard.sessions:
+                    session = next(iter(shard.sessions.values()))
+                    if not session.is_expired(self.session_ttl_hours):
+                        break
+                    shard.pop_oldest()
+                    self._dirty = True
+
+    def load_snapshot(self) -> int:
+        # Only at startup: sessions restored from an earlier load would still point at its map
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path) or self._snapshot is not None:
+            return 0
+        snapshot = SnapshotFile(self.snapshot_path)
+        cutoff = time.time() - self.session_ttl_hours * 3600
+        live = [entry for entry in snapshot.index if entry[0] >= cutoff]
+        # The index is least recently used first: keep the newest sessions that fit, in order,
+        # so inserting them rebuilds each shard's LRU order
+        room = max(self.max_sessions - self.count_sessions(), 0)
+        by_shard = [[] for _ in self._shards]
+        for last_accessed, session_id, offset, length in live[max(len(live) - room, 0):]:
+            by_shard[hash(session_id) % len(self._shards)].append(
+                (session_id, _SnapshottedSession(snapshot, offset, length, last_accessed))
+            )
+
+        registered = 0
+        for shard, entries in zip(self._shards, by_shard):
+            with shard.lock:
+                for session_id, entry in entries:
+                    # Sessions created before the snapshot was loaded are newer than it
+                    if session_id not in shard.sessions:
+                        shard.sessions[session_id] = entry
+                        registered += 1
+                shard.ids = SortedList(shard.sessions)
+        if registered:
+            self._snapshot = snapshot
+        else:
+            snapshot.close()
+        return registered
+
+    def save_snapshot(self) -> Optional[int]:
+        if not self.snapshot_path:
+            return None
+        with self._snapshot_lock:
+            if not self._dirty:
+                return None
+            self._dirty = False
+            entries = []
+            for shard in self._shards:
+                with shard.lock:
+                    entries.extend(shard.sessions.items())
+            tmp_path = self.snapshot_path + ".tmp"
+            try:
+                # Sessions never accessed since the last restore are copied as raw bytes, not re-encoded
+                written = write_snapshot(tmp_path, (
+                    (session_id, session.last_accessed, session.read() if isinstance(session, _SnapshottedSession)
+                     else session.to_record())
+                    for session_id, session in entries
+                ))
+                self._replace_snapshot(tmp_path)
+            except BaseException:
+                self._dirty = True
+                raise
+        return written
+
+    def _replace_snapshot(self, tmp_path: str) -> None:
+        """
+        Move a newly written snapshot over the live one and point sessions not yet restored at it.
+
+        The old file stays mapped while sessions are read from it, and Windows
+        cannot replace a mapped file, so it is unmapped first. Every shard is
+        locked meanwhile so that no session is decoded from a closed map.
+        """
+        with ExitStack() as stack:
+            for shard in self._shards:
+                stack.enter_context(shard.lock)
+            pending = [
+                (shard, session_id, session)
+                for shard in self._shards
+                for session_id, session in shard.sessions.items()
+                if isinstance(session, _SnapshottedSession)
+            ]
+            if self._snapshot is not None:
+                self._snapshot.close()
+                self._snapshot = None
+            try:
+                os.replace(tmp_path, self.snapshot_path)
+            finally:
+                # Either the new file or, if the replace failed, the old one, whose index still matches
+                if pending:
+                    self._snapshot = SnapshotFile(self.snapshot_path)
+                    locations = {
+                        session_id: (offset, length) for _, session_id, offset, length in self._snapshot.index
+                    }
+                    for shard, session_id, session in pending:
+                        offset, length = locations[session_id]
+                        shard.sessions[session_id] = session._replace(
+                            snapshot=self._snapshot, offset=offset, length=length
+                        )
+
+    def close(self) -> None:
+        with self._snapshot_lock:
+            if self._snapshot is not None:
+                self._snapshot.close()
+                self._snapshot = None
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Durable session store backed by SQLite in WAL mode.
+
+    Several worker processes on one host can share the same database file.
+    Each thread uses its own connection; appends for a turn are written in a
+    single transaction and expiry is done by the sweeper with indexed DELETEs.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            created_at REAL NOT NULL,
+            last_accessed REAL NOT NULL,
+            next_seq INTEGER NOT NULL DEFAULT 0,
+            metadata TEXT NOT NULL DEFAULT '{}'
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_last_accessed ON sessions (last_accessed);
+        -- Maintained by triggers in the same transaction as each insert and delete, so counting is one row read
+        CREATE TABLE IF NOT EXISTS session_count (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            sessions INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO session_count (id, sessions)
+            SELECT 0, COUNT(*) FROM sessions WHERE NOT EXISTS (SELECT 1 FROM session_count);
+        CREATE TRIGGER IF NOT EXISTS sessions_count_insert AFTER INSERT ON sessions
+        BEGIN
+            UPDATE session_count SET sessions = sessions + 1 WHERE id = 0;
+        END;
+        CREATE TRIGGER IF NOT EXISTS sessions_count_delete AFTER DELETE ON sessions
+        BEGIN
+            UPDATE session_count SET sessions = sessions - 1 WHERE id = 0;
+        END;
+        CREATE TABLE IF NOT EXISTS messages (
+            session_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp REAL NOT NULL,
+            tokens INTEGER NOT NULL,
+            PRIMARY KEY (session_id, seq)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(
+        self,
+        path: str,
+        session_ttl_hours: int = 24,
+        max_sessions: int = 1000,
+        max_messages: int = 50
+    ):
+        super().__init__(session_ttl_hours, max_sessions, max_messages)
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        with self._connection() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _touch(self, conn: sqlite3.Connection, session_id: str) -> bool:
+        """Update last_accessed; returns False if the session does not exist"""
+        cursor = conn.execute(
+            "UPDATE sessions SET last_accessed = ? WHERE session_id = ?",
+            (time.time(), session_id)
+        )
+        return cursor.rowcount > 0
+
+    def append_messages(self, session_id: str, messages: List[Tuple[str, str]]) -> None:
+        if not messages:
+            return
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO sessions (session_id, created_at, last_accessed) VALUES (?, ?, ?)",
+                (session_id, now, now)
+            )
+            conn.execute(
+                "UPDATE sessions SET next_seq = next_seq + ?, last_accessed = ? WHERE session_id = ?",
+                (len(messages), now, session_id)
+            )
+            next_seq = conn.execute(
+                "SELECT next_seq FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+            first_seq = next_seq - len(messages)
+            conn.executemany(
+                "INSERT INTO messages (session_id, seq, role, content, timestamp, tokens) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (session_id, first_seq + i, role, content, now, estimate_tokens(content))
+                    for i, (role, content) in enumerate(messages)
+                ]
+            )
+            # Keep only the last max_messages
+            conn.execute(
+                "DELETE FROM messages WHERE session_id = ? AND seq < ?",
+                (session_id, next_seq - self.max_messages)
+            )
+
+    def get_messages(self, session_id: str, limit: Optional[int] = None) -> List[StoredMessage]:
+        with self._connection() as conn:
+            self._touch(conn, session_id)
+            rows = conn.execute(
+                "SELECT role, content, timestamp, tokens, seq FROM messages WHERE session_id = ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (session_id, limit or -1)
+            ).fetchall()
+        return [StoredMessage(*row) for row in reversed(rows)]
+
+    def _message_count(self, conn: sqlite3.Connection, session_id: str, next_seq: int) -> int:
+        """Stored sequence numbers are contiguous up to next_seq, so counting is one index lookup, not a scan"""
+        first_seq = conn.execute(
+            "SELECT MIN(seq) FROM messages WHERE session_id = ?", (session_id,)
+        ).fetchone()[0]
+        return 0 if first_seq is None else next_seq - first_seq
+
+    def get_history(
+        self, session_id: str, limit: Optional[int] = None, before: Optional[int] = None, after: Optional[int] = None
+    ) -> Optional[HistoryPage]:
+        conn = self._connection()
+        session = conn.execute("SELECT next_seq FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if session is None:
+            return None
+        query = "SELECT role, content, timestamp, tokens, seq FROM messages WHERE session_id = ?"
+        params: List[Any] = [session_id]
+        if after is not None:
+            query += " AND seq > ?"
+            params.append(after)
+        if before is not None:
+            query += " AND seq < ?"
+            params.append(before)
+        query += " ORDER BY seq LIMIT ?" if after is not None else " ORDER BY seq DESC LIMIT ?"
+        params.append(limit + 1 if limit else -1)
+        rows = conn.execute(query, params).fetchall()
+
+        has_more = bool(limit) and len(rows) > limit
+        if has_more:
+            rows = rows[:limit]
+        if after is None:
+            rows.reverse()
+        return HistoryPage(
+            [StoredMessage._make(row) for row in rows], self._message_count(conn, session_id, session[0]), has_more
+        )
+
+    def get_history_version(self, session_id: str) -> Optional[str]:
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT created_at, next_seq FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        created_at, next_seq = row
+        return f"{created_at!r}:{next_seq}:{self._message_count(conn, session_id, next_seq)}"
+
+    def get_messages_since(self, session_id: str, start_seq: int) -> Optional[List[StoredMessage]]:
+        with self._connection() as conn:
+            if not self._touch(conn, session_id):
+                return None
+            rows = conn.execute(
+                "SELECT role, content, timestamp, tokens, seq FROM messages "
+                "WHERE session_id = ? AND seq >= ? ORDER BY seq",
+                (session_id, start_seq)
+            ).fetchall()
+        return [StoredMessage._make(row) for row in rows]
+
+    def clear_session(self, session_id: str) -> bool:
+        with self._connection() as conn:
+            if not self._touch(conn, session_id):
+                return False
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.execute("UPDATE sessions SET metadata = '{}' WHERE session_id = ?", (session_id,))
+            return True
+
+    def get_metadata(self, session_id: str) -> Dict[str, Any]:
+        row = self._connection().execute(
+            "SELECT metadata FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def update_metadata(self, session_id: str, values: Dict[str, Any]) -> bool:
+        # json_patch merges in a single statement, so concurrent workers cannot lose updates
+        with self._connection() as conn:
+            return conn.execute(
+                "UPDATE sessions SET metadata = json_patch(metadata, ?) WHERE session_id = ?",
+                (json.dumps(values), session_id)
+            ).rowcount > 0
+
+    def delete_session(self, session_id: str) -> bool:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            return conn.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+            ).rowcount > 0
+
+    def list_sessions(self) -> List[str]:
+        rows = self._connection().execute("SELECT session_id FROM sessions").fetchall()
+        return [row[0] for row in rows]
+
+    def list_sessions_page(
+        self, limit: int, before: Optional[str] = None, after: Optional[str] = None
+    ) -> Tuple[List[str], bool]:
+        # Keyset pagination over the primary key: each page is an index range scan
+        query = "SELECT session_id FROM sessions WHERE 1"
+        params: List[Any] = []
+        if after is not None:
+            query += " AND session_id > ?"
+            params.append(after)
+        if before is not None:
+            query += " AND session_id < ?"
+            params.append(before)
+        query += " ORDER BY session_id LIMIT ?" if after is not None else " ORDER BY session_id DESC LIMIT ?"
+        params.append(limit + 1)
+        page = [row[0] for row in self._connection().execute(query, params).fetchall()]
+
+        has_more = len(page) > limit
+        if has_more:
+            page = page[:limit]
+        if after is None:
+            page.reverse()
+        return page, has_more
+
+    def count_sessions(self) -> int:
+        return self._connection().execute("SELECT sessions FROM session_count WHERE id = 0").fetchone()[0]
+
+    def get_session_stats(self, session_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT created_at, last_accessed, next_seq FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        created_at, last_accessed, next_seq = row
+        return {
+            "session_id": session_id,
+            "message_count": self._message_count(conn, session_id, next_seq),
+            "created_at": datetime.fromtimestamp(created_at).isoformat(),
+            "last_accessed": datetime.fromtimestamp(last_accessed).isoformat(),
+            "is_expired": time.time() - last_accessed > self.session_ttl_hours * 3600
+        }
+
+    def cleanup_expired(self) -> None:
+        cutoff = time.time() - self.session_ttl_hours * 3600
+        with self._connection() as conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS evicted (session_id TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM evicted")
+            conn.execute(
+                "INSERT INTO evicted SELECT session_id FROM sessions WHERE last_accessed < ?", (cutoff,)
+            )
+            # If we still have too many sessions, remove oldest ones
+            conn.execute(
+                "INSERT OR IGNORE INTO evicted SELECT session_id FROM sessions "
+                "ORDER BY last_accessed DESC LIMIT -1 OFFSET ?",
+                (self.max_sessions,)
+            )
+            conn.execute("DELETE FROM messages WHERE session_id IN (SELECT session_id FROM evicted)")
+            conn.execute("DELETE FROM sessions WHERE session_id IN (SELECT session_id FROM evicted)")
+
+    def close(self) -> None:
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+def create_session_store(
+    backend: str,
+    session_ttl_hours: int = 24,
+    max_sessions: int = 1000,
+    max_messages: int = 50,
+    path: Optional[str] = None,
+    num_shards: int = 16,
+    snapshot_path: Optional[str] = None
+) -> SessionStore:
+    """Build the configured session store backend"""
+    if backend == "memory":
+        return InMemorySessionStore(session_ttl_hours, max_sessions, max_messages, num_shards, snapshot_path)
+    if backend == "sqlite":
+        return SQLiteSessionStore(path, session_ttl_hours, max_sessions, max_messages)
+    raise ValueError(f"Unknown session store backend: {backend}")
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+from typing import Optional, Set
+from .. import config
+from .memory_service import MemoryService
+from .llm_gateway import LLMGateway
+
+
+logger = logging.getLogger(__name__)
+
+
+SUMMARY_PROMPT = """
+You maintain a running summary of a tutoring conversation between a student and an assistant.
+Update the existing summary with the new turns below. Keep the topics covered, the student's
+questions, key explanations, formulas or code, and anything the student is still confused about.
+Be concise and write in plain prose. Reply with the updated summary only.
+"""
+
+
+class SummaryService:
+    """Folds older turns of long sessions into a running summary, off the request path"""
+
+    def __init__(
+        self,
+        memory_service: MemoryService,
+        gateway: LLMGateway,
+        enabled: bool = config.SUMMARY_ENABLED,
+        trigger_messages: int = config.SUMMARY_TRIGGER_MESSAGES,
+        keep_recent: int = config.SUMMARY_KEEP_RECENT
+    ):
+        self.memory_service = memory_service
+        self.gateway = gateway
+        self.enabled = enabled
+        self.trigger_messages = trigger_messages
+        self.keep_recent = keep_recent
+        self._in_flight: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def get_summary(self, session_id: str) -> tuple:
+        """Get the running summary and the sequence number of the first unsummarized message"""
+        metadata = self.memory_service.get_metadata(session_id)
+        return metadata.get("summary"), metadata.get("summary_upto", 0)
+
+    def schedule(self, session_id: str) -> None:
+        """Summarize the session in the background if it has grown past the threshold"""
+        if not self.enabled or session_id in self._in_flight:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._in_flight.add(session_id)
+        task = loop.create_task(self._summarize(session_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _summarize(self, session_id: str) -> None:
+        try:
+            summary, summary_upto = self.get_summary(session_id)
+            pending = [m for m in self.memory_service.get_messages(session_id) if m.seq >= summary_upto]
+            if len(pending) <= self.trigger_messages:
+                return
+
+            to_fold = pending[:-self.keep_recent]
+            transcript = "\n".join(f"{m.role}: {m.content}" for m in to_fold)
+            reply = await self.gateway.ainvoke([
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {
+                    "role": "user",
+                    "content": f"Existing summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"
+                }
+            ], node="summarize", model=config.SUMMARY_MODEL)
+            self.memory_service.update_metadata(session_id, {
+                "summary": reply.content,
+                "summary_upto": to_fold[-1].seq + 1
+            })
+        except Exception:
+            logger.exception("summary failed", extra={"session_id": session_id})
+        finally:
+            self._in_flight.discard(session_id)
+
+    async def wait_idle(self, timeout: Optional[float] = None) -> None:
+        """Wait for in-flight summaries to finish"""
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
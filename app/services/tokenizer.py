@@ -0,0 +1,15 @@
+import re
+
+
+# Word pieces, runs of digits and individual punctuation roughly track how
+# BPE tokenizers split prose and code
+_PIECE_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a text without a model-specific tokenizer"""
+    tokens = 0
+    for piece in _PIECE_PATTERN.findall(text):
+        # Long words are split into several subword tokens
+        tokens += 1 + len(piece) // 8
+    return max(tokens, 1)
@@ -1,6 +1,12 @@
+import asyncio
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from langgraph.graph import StateGraph, START, END
+from .. import config
 from ..models.state import State
 from .agent_service import AgentService
+from .checkpointer import SessionCheckpointer
+from .metrics import REQUEST_LATENCY, timed_node
 
 
 class WorkflowService:
@@ -8,34 +14,165 @@ class WorkflowService:
     
     def __init__(self):
         self.agent_service = AgentService()
+        self.agents = {node: timed_node(node, agent) for node, agent in self.agent_service.build_agents().items()}
         self.workflow = self._build_workflow()
-        self.app = self.workflow.compile()
+        # Batch items are classified together up front, so their graph starts at the agent
+        self.batch_workflow = self._build_workflow(classify=False)
+        # Each session is a checkpointer thread: its history is loaded into State and the new turn saved on exit
+        self.checkpointer = SessionCheckpointer(self.agent_service.memory_service.store)
+        self.app = self.workflow.compile(checkpointer=self.checkpointer)
+        self.batch_app = self.batch_workflow.compile(checkpointer=self.checkpointer)
+        # Messages without a session have no thread to load or save
+        self.stateless_app = self.workflow.compile()
+        self.stateless_batch_app = self.batch_workflow.compile()
 
-    def _build_workflow(self) -> StateGraph:
-        """Build the LangGraph workflow"""
+    def startup(self) -> None:
+        """Start background tasks; must be called from the running event loop"""
+        self.agent_service.startup()
+
+    def shutdown(self) -> None:
+        """Release resources and persist caches on application shutdown"""
+        self.agent_service.shutdown()
+
+    def _build_workflow(self, classify: bool = True) -> StateGraph:
+        """Build the LangGraph workflow; without classify, messages must arrive with their course set"""
         workflow = StateGraph(State)
         
-        # Add nodes
-        workflow.add_node("classify_message", self.agent_service.classify_message)
-        workflow.add_node("spl_agent", self.agent_service.spl_agent)
-        workflow.add_node("english_agent", self.agent_service.english_agent)
-        workflow.add_node("physics_agent", self.agent_service.physics_agent)
-        workflow.add_node("fallback_agent", self.agent_service.fallback_agent)
+        # Add nodes: one agent per registered course, plus the classifier unless messages arrive classified
+        for node, agent in self.agents.items():
+            workflow.add_node(node, agent)
 
         # Add edges
-        workflow.add_edge(START, "classify_message")
-        workflow.add_conditional_edges("classify_message", self.agent_service.router)
-        workflow.add_edge("spl_agent", END)
-        workflow.add_edge("english_agent", END)
-        workflow.add_edge("physics_agent", END)
-        workflow.add_edge("fallback_agent", END)
+        if classify:
+            workflow.add_node("classify_message", timed_node("classify_message", self.agent_service.classify_message))
+            workflow.add_edge(START, "classify_message")
+            workflow.add_conditional_edges("classify_message", self.agent_service.router, list(self.agents))
+        else:
+            workflow.add_conditional_edges(START, self.agent_service.router, list(self.agents))
+        for node in self.agents:
+            workflow.add_edge(node, END)
 
         return workflow
 
-    def process_message(self, message: str, session_id: str = None) -> dict:
-        """Process a message through the workflow"""
-        result = self.app.invoke({
+    def _initial_state(self, message: str, session_id: str = None, speculate: bool = False) -> dict:
+        """Build the graph input for a single user message"""
+        return {
             "messages": [{"role": "user", "content": message}],
-            "session_id": session_id
-        })
+            "session_id": session_id,
+            "speculate": speculate
+        }
+
+    def _graph_for(self, session_id: Optional[str], classified: bool = False) -> tuple:
+        """Get the compiled graph and its run arguments for a session's thread"""
+        if not session_id:
+            return (self.stateless_batch_app if classified else self.stateless_app), {}
+        # Checkpoint once when the run exits; the checkpointer keeps no intermediate steps
+        app = self.batch_app if classified else self.app
+        return app, {"config": {"configurable": {"thread_id": session_id}}, "durability": "exit"}
+
+    async def _invoke(self, state: dict, classified: bool = False) -> dict:
+        session_id = state["session_id"]
+        app, run_args = self._graph_for(session_id, classified)
+        result = await app.ainvoke(state, **run_args)
+        if session_id:
+            self.agent_service.summary_service.schedule(session_id)
         return result
+
+    async def aprocess_message(self, message: str, session_id: str = None) -> dict:
+        """Process a message through the workflow without blocking the event loop"""
+        start = time.perf_counter()
+        # Not for streaming: a draft's tokens cannot be shown before the classification confirms it
+        result = await self._invoke(self._initial_state(message, session_id, speculate=config.SPECULATIVE_EXECUTION))
+        REQUEST_LATENCY.labels("message").observe(time.perf_counter() - start)
+        return result
+
+    async def aprocess_batch(
+        self,
+        items: List[Tuple[str, Optional[str]]],
+        concurrency: int = config.BATCH_CONCURRENCY
+    ) -> List[object]:
+        """
+        Process (message, session_id) pairs with a single classification call.
+
+        Specialist agents then run concurrently, at most `concurrency` at a time,
+        except that items of one session run one after another in input order, so
+        each sees the turns before it. Results are returned in input order; a
+        failed item yields its exception instead of a result.
+        """
+        start = time.perf_counter()
+        courses = await self.agent_service.classify_batch(
+            [message for message, _ in items], [session_id for _, session_id in items]
+        )
+        semaphore = asyncio.Semaphore(concurrency)
+
+        results: List[object] = [None] * len(items)
+
+        async def run_session(indexes: List[int]) -> None:
+            for i in indexes:
+                message, session_id = items[i]
+                state = {**self._initial_state(message, session_id), "course": courses[i]}
+                try:
+                    async with semaphore:
+                        results[i] = await self._invoke(state, classified=True)
+                except Exception as e:
+                    results[i] = e
+
+        # Items without a session are independent; each gets a chain of its own
+        chains: Dict[object, List[int]] = {}
+        for i, (_, session_id) in enumerate(items):
+            chains.setdefault(session_id or i, []).append(i)
+        await asyncio.gather(*[run_session(indexes) for indexes in chains.values()])
+        REQUEST_LATENCY.labels("batch").observe(time.perf_counter() - start)
+        return results
+
+    async def astream_message(self, message: str, session_id: str = None) -> AsyncIterator[dict]:
+        """
+        Stream a message through the workflow.
+
+        Yields a "classification" event as soon as classify_message finishes, a "token"
+        event per chunk produced by the specialist agent, and a final "done" event
+        carrying the final state and time-to-first-token. The turn is saved to the
+        session only once the stream has run to the end.
+        """
+        start = time.perf_counter()
+        first_token_at = None
+        result = None
+
+        app, run_args = self._graph_for(session_id)
+        async for event in app.astream_events(self._initial_state(message, session_id), version="v2", **run_args):
+            kind = event["event"]
+            node = event.get("metadata", {}).get("langgraph_node")
+
+            if kind == "on_chain_end" and event["name"] == "classify_message":
+                yield {"event": "classification", "data": {"course": event["data"]["output"]["course"]}}
+            elif kind == "on_chat_model_stream" and node != "classify_message":
+                content = event["data"]["chunk"].content
+                if isinstance(content, str) and content:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    yield {"event": "token", "data": {"content": content}}
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                result = event["data"]["output"]
+
+        if session_id:
+            self.agent_service.summary_service.schedule(session_id)
+        ttft = (first_token_at or time.perf_counter()) - start
+        REQUEST_LATENCY.labels("stream").observe(time.perf_counter() - start)
+        yield {
+            "event": "done",
+            "data": {"result": result, "time_to_first_token_ms": round(ttft * 1000, 1)}
+        }
+
+    def process_message(self, message: str, session_id: str = None) -> dict:
+        """
+        Process a message through the workflow, blocking until it completes.
+
+        Runs the workflow in a new event loop, so it is only for callers outside
+        one (scripts, the CLI). Raises RuntimeError when called from a running
+        event loop; await aprocess_message there instead.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.aprocess_message(message, session_id))
+        raise RuntimeError("process_message() cannot be called from a running event loop; await aprocess_message()")
@@ -1,6 +1,11 @@
+import json
 from datetime import datetime
-from ..models.schemas import ChatResponse, HealthResponse, ErrorResponse
-from langchain.schema import AIMessage
+from typing import List
+from ..models.schemas import (
+    ChatMessage, ChatResponse, HealthResponse, ErrorResponse, ConversationHistoryResponse,
+    BatchChatItemResponse, BatchChatResponse
+)
+from langchain_core.messages import AIMessage
 
 
 class ResponseFormatter:
@@ -9,9 +14,9 @@ class ResponseFormatter:
     @staticmethod
     def format_chat_response(result: dict, session_id: str = None) -> ChatResponse:
         """Format chat workflow result into ChatResponse"""
-        # Extract AI message content
+        # Extract the reply: the last AI message, after any history loaded for the session
         ai_message = None
-        for message in result["messages"]:
+        for message in reversed(result["messages"]):
             if isinstance(message, AIMessage):
                 ai_message = message.content
                 break
@@ -28,6 +33,58 @@ class ResponseFormatter:
             timestamp=datetime.now()
         )
     
+    @staticmethod
+    def format_batch_response(results: List, session_ids: List[str]) -> BatchChatResponse:
+        """Format per-item workflow results or exceptions into a BatchChatResponse"""
+        items = []
+        for index, (result, session_id) in enumerate(zip(results, session_ids)):
+            if isinstance(result, Exception):
+                items.append(BatchChatItemResponse(
+                    index=index,
+                    session_id=session_id,
+                    error=f"Error processing message: {str(result)}"
+                ))
+            else:
+                response = ResponseFormatter.format_chat_response(result, session_id)
+                items.append(BatchChatItemResponse(
+                    index=index,
+                    message=response.message,
+                    course=response.course,
+                    session_id=session_id
+                ))
+        failed = sum(1 for item in items if item.error)
+        return BatchChatResponse(
+            results=items,
+            succeeded=len(items) - failed,
+            failed=failed,
+            timestamp=datetime.now()
+        )
+    
+    @staticmethod
+    def format_history_response(
+        session_id: str, messages: List, total_messages: int, has_more: bool = False
+    ) -> ConversationHistoryResponse:
+        """Format stored session messages into a ConversationHistoryResponse"""
+        return ConversationHistoryResponse(
+            session_id=session_id,
+            messages=[
+                ChatMessage(
+                    role=message.role,
+                    content=message.content,
+                    timestamp=datetime.fromtimestamp(message.timestamp),
+                    seq=message.seq
+                )
+                for message in messages
+            ],
+            total_messages=total_messages,
+            has_more=has_more
+        )
+    
+    @staticmethod
+    def format_sse_event(event: str, data: dict) -> str:
+        """Format a Server-Sent Events frame"""
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
     @staticmethod
     def format_health_response() -> HealthResponse:
         """Format health check response"""
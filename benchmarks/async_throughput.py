@@ -0,0 +1,65 @@
+"""
+Concurrent-request throughput of the chat workflow against a stubbed slow LLM.
+
+Compares a blocking model call on the event loop (the old behaviour) with the
+async path, and probes event-loop responsiveness (what /health sees) under load.
+
+Run with: python -m benchmarks.async_throughput --requests 50 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.services import agent_service
+from app.services.workflow_service import WorkflowService
+from benchmarks.fake_llm import FakeChatModel
+
+
+async def _probe_loop(stop: asyncio.Event, samples: list) -> None:
+    """Measure how long a trivial task waits to be scheduled"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        samples.append(time.perf_counter() - start - 0.01)
+
+
+async def run(requests: int, latency: float, blocking: bool) -> dict:
+    llm = FakeChatModel(latency=f"const:{latency}", blocking=blocking, course="Physics")
+    agent_service.get_llm = lambda *args, **kwargs: llm
+    workflow_service = WorkflowService()
+
+    stop = asyncio.Event()
+    samples = []
+    probe = asyncio.create_task(_probe_loop(stop, samples))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        workflow_service.aprocess_message(f"What is velocity? #{i}", f"bench-{i}")
+        for i in range(requests)
+    ])
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await probe
+    return {
+        "mode": "blocking" if blocking else "async",
+        "requests": requests,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2),
+        "max_loop_stall_ms": round(max(samples, default=0.0) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub LLM latency per call in seconds")
+    args = parser.parse_args()
+
+    for blocking in (True, False):
+        print(asyncio.run(run(args.requests, args.latency, blocking)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import asyncio
+import math
+import random
+import re
+import time
+import zlib
+from typing import List, Optional, get_args
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+from app.services.tokenizer import estimate_tokens
+
+
+class FakeProviderError(Exception):
+    """Injected provider failure; its 503 status makes the gateway treat it as transient"""
+    status_code = 503
+
+
+class LatencyDistribution:
+    """
+    Seeded latency sampler parsed from a spec string:
+
+      const:0.2             always 0.2s
+      uniform:0.1:0.3       uniform between 0.1s and 0.3s
+      lognormal:0.2:0.5     median 0.2s with log-space sigma 0.5 (long right tail)
+    """
+
+    def __init__(self, spec: str, rng: random.Random):
+        kind, *params = spec.split(":")
+        self.kind = kind
+        self.params = [float(param) for param in params]
+        self.rng = rng
+        if kind not in ("const", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self) -> float:
+        if self.kind == "const":
+            return self.params[0]
+        if self.kind == "uniform":
+            return self.rng.uniform(*self.params)
+        median, sigma = self.params
+        return self.rng.lognormvariate(math.log(median), sigma)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic, offline chat model standing in for get_llm() in benchmarks and load tests.
+
+    A real LangChain chat model, so /chat/stream receives token events. Latency
+    (time to first token) follows a seeded distribution. Tokens then arrive at
+    token_rate per second (0 means all at once). error_rate of the calls raise
+    FakeProviderError. Structured output returns a valid schema instance with
+    the fixed course, if one is set, or else a course picked from the schema's
+    allowed labels by hashing the message, so the same message always gets the
+    same label. With blocking, waits sleep the thread instead of yielding to the
+    event loop, like a synchronous model call made from async code.
+    """
+
+    latency: str = "const:0.2"
+    token_rate: float = 0.0
+    reply_tokens: int = 40
+    error_rate: float = 0.0
+    course: Optional[str] = None
+    seed: int = 0
+    blocking: bool = False
+    _rng: random.Random = PrivateAttr()
+    _latency: LatencyDistribution = PrivateAttr()
+
+    def model_post_init(self, context) -> None:
+        self._rng = random.Random(self.seed)
+        self._latency = LatencyDistribution(self.latency, self._rng)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark"
+
+    async def _wait(self, seconds: float) -> None:
+        if self.blocking:
+            time.sleep(seconds)
+        else:
+            await asyncio.sleep(seconds)
+
+    def _fail_maybe(self) -> None:
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise FakeProviderError("injected provider error")
+
+    def _words(self, messages: List[BaseMessage]) -> List[str]:
+        seed = zlib.crc32(str(messages[-1].content).encode("utf-8"))
+        return [f"w{(seed + i) % 997}" for i in range(self.reply_tokens)]
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        words = self._words(messages)
+        input_tokens = sum(estimate_tokens(str(message.content)) for message in messages)
+        message = AIMessage(content=" ".join(words), usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": len(words),
+            "total_tokens": input_tokens + len(words),
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generation_time(self) -> float:
+        stream_time = self.reply_tokens / self.token_rate if self.token_rate else 0.0
+        return self._latency.sample() + stream_time
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._generation_time())
+        self._fail_maybe()
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await self._wait(self._generation_time())
+        self._fail_maybe()
+        return self._result(messages)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await self._wait(self._latency.sample())
+        self._fail_maybe()
+        result = self._result(messages).generations[0].message
+        words = result.content.split(" ")
+        for i, word in enumerate(words):
+            if self.token_rate and i:
+                await self._wait(1 / self.token_rate)
+            last = i == len(words) - 1
+            chunk = AIMessageChunk(
+                content=word if last else word + " ",
+                usage_metadata=result.usage_metadata if last else None
+            )
+            yield ChatGenerationChunk(message=chunk)
+
+    def with_structured_output(self, schema, **kwargs):
+        return _FakeStructuredChatModel(self, schema)
+
+
+class _FakeStructuredChatModel:
+    """Structured-output view of FakeChatModel"""
+
+    def __init__(self, llm: FakeChatModel, schema):
+        self.llm = llm
+        self.schema = schema
+        field = "courses" if "courses" in schema.model_fields else "course"
+        annotation = schema.model_fields[field].annotation
+        if field == "courses":
+            annotation = get_args(annotation)[0]
+        self.field = field
+        self.labels = list(get_args(annotation))
+
+    def _label(self, text: str) -> str:
+        if self.llm.course:
+            return self.llm.course
+        return self.labels[zlib.crc32(text.encode("utf-8")) % len(self.labels)]
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        await self.llm._wait(self.llm._latency.sample())
+        self.llm._fail_maybe()
+        text = messages[-1]["content"]
+        if self.field == "courses":
+            # Batch classification: one label per numbered message
+            items = re.findall(r"^\d+\. (.*)$", text, re.MULTILINE)
+            return self.schema(courses=[self._label(item) for item in items])
+        return self.schema(course=self._label(text))
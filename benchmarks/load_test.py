@@ -0,0 +1,257 @@
+"""
+Offline load test of the FastAPI app against a deterministic fake chat model.
+
+get_llm() is swapped for FakeChatModel, so no network or API key is needed.
+Requests are driven either in-process through the ASGI app ("inprocess") or
+over real HTTP against a uvicorn server started in this process ("http"), at a
+fixed concurrency. The in-process transport buffers whole response bodies, so
+/chat/stream is always driven over HTTP, where time to first token is real. Each request reuses an earlier session with probability
+--session-reuse, otherwise it starts a new one.
+
+Reports throughput, p50/p95/p99 latency (plus time to first token for
+/chat/stream), the error count, and how much the session store grew. With
+--output the report is saved as JSON. With --compare, the run is checked
+against an earlier report and the script exits non-zero when p95 latency or
+throughput regressed by more than --max-regression.
+
+Run with:
+  python -m benchmarks.load_test --requests 500 --concurrency 50 --latency lognormal:0.2:0.4
+  python -m benchmarks.load_test --endpoint stream --token-rate 200 --output run.json
+  python -m benchmarks.load_test --compare run.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx
+import uvicorn
+
+from app import config
+from app.services import agent_service
+from benchmarks.fake_llm import FakeChatModel
+from cli import percentile
+
+
+def load_questions() -> list:
+    """Questions across every course, taken from the local classifier's training data"""
+    with open(config.LOCAL_CLASSIFIER_TRAINING, encoding="utf-8") as f:
+        return [json.loads(line)["text"] for line in f if line.strip()]
+
+
+def store_size(memory_service) -> dict:
+    """Sessions, messages and message bytes held by the session store"""
+    sessions = memory_service.get_active_sessions()
+    messages = 0
+    content_bytes = 0
+    for session_id in sessions:
+        stored = memory_service.get_messages(session_id)
+        messages += len(stored)
+        content_bytes += sum(len(message.content.encode("utf-8")) for message in stored)
+    return {"sessions": len(sessions), "messages": messages, "content_bytes": content_bytes}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def one_request(client: httpx.AsyncClient, endpoint: str, payload: dict) -> tuple:
+    """Send one chat request; returns (ok, latency, time to first token or None)"""
+    start = time.perf_counter()
+    if endpoint == "stream":
+        first_token = None
+        async with client.stream("POST", "/chat/stream", json=payload) as response:
+            ok = response.status_code == 200
+            async for line in response.aiter_lines():
+                if line == "event: token" and first_token is None:
+                    first_token = time.perf_counter() - start
+                elif line == "event: error":
+                    ok = False
+        return ok, time.perf_counter() - start, first_token
+    path = "/chat/batch" if endpoint == "batch" else "/chat"
+    response = await client.post(path, json=payload)
+    ok = response.status_code == 200 and not (endpoint == "batch" and response.json()["failed"])
+    return ok, time.perf_counter() - start, None
+
+
+async def drive(client: httpx.AsyncClient, args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    questions = load_questions()
+    sessions = []
+    jobs = []
+    for i in range(args.requests):
+        if sessions and rng.random() < args.session_reuse:
+            session_id = rng.choice(sessions)
+        else:
+            session_id = str(uuid.uuid4())
+            sessions.append(session_id)
+        message = rng.choice(questions)
+        if args.unique:
+            message = f"{message} (#{i})"
+        if args.endpoint == "batch":
+            payload = {"messages": [{"message": message, "session_id": session_id}] * args.batch_size}
+        else:
+            payload = {"message": message, "session_id": session_id}
+        jobs.append(payload)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for payload in jobs:
+        queue.put_nowait(payload)
+    latencies, first_tokens = [], []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        while not queue.empty():
+            payload = queue.get_nowait()
+            try:
+                ok, latency, first_token = await one_request(client, args.endpoint, payload)
+            except httpx.HTTPError:
+                ok, latency, first_token = False, 0.0, None
+            errors += not ok
+            if ok:
+                latencies.append(latency)
+                if first_token is not None:
+                    first_tokens.append(first_token)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    first_tokens.sort()
+    results = {
+        "requests": args.requests,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(args.requests / elapsed, 2),
+        "latency_p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "latency_p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "distinct_sessions": len(sessions),
+    }
+    if first_tokens:
+        results["ttft_p50_ms"] = round(percentile(first_tokens, 0.50) * 1000, 1)
+        results["ttft_p95_ms"] = round(percentile(first_tokens, 0.95) * 1000, 1)
+    return results
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run(args: argparse.Namespace) -> dict:
+    fake = FakeChatModel(
+        latency=args.latency, token_rate=args.token_rate, reply_tokens=args.reply_tokens,
+        error_rate=args.error_rate, seed=args.seed
+    )
+    agent_service.get_llm = lambda *a, **k: fake
+    # Imported after patching: the controller builds its services at import time
+    from app.main import app, chat_controller
+    memory_service = chat_controller.workflow_service.agent_service.memory_service
+
+    before = store_size(memory_service)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timeout = httpx.Timeout(300.0)
+    if args.transport == "inprocess":
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout) as client:
+                results = await drive(client, args)
+    else:
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.01)
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", timeout=timeout, limits=limits
+        ) as client:
+            results = await drive(client, args)
+        server.should_exit = True
+        await serving
+
+    after = store_size(memory_service)
+    results["memory"] = {
+        "sessions_added": after["sessions"] - before["sessions"],
+        "messages_added": after["messages"] - before["messages"],
+        "content_bytes_added": after["content_bytes"] - before["content_bytes"],
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_growth_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before,
+    }
+    return results
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> bool:
+    """Print the change against a baseline report; returns False on a regression beyond the limit"""
+    ok = True
+    for key, higher_is_better in (("throughput_rps", True), ("latency_p95_ms", False), ("latency_p99_ms", False)):
+        old, new = baseline["results"][key], report["results"][key]
+        change = (new - old) / old if old else 0.0
+        regressed = (-change if higher_is_better else change) > max_regression
+        ok = ok and not regressed
+        print(f"{key}: {old} -> {new} ({change:+.1%}){'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--transport", choices=("inprocess", "http"), help="Default: http for --endpoint stream, else inprocess"
+    )
+    parser.add_argument("--endpoint", choices=("chat", "stream", "batch"), default="chat")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--session-reuse", type=float, default=0.5, help="Chance a request reuses an earlier session")
+    parser.add_argument("--batch-size", type=int, default=10, help="Messages per request with --endpoint batch")
+    parser.add_argument("--unique", action="store_true", help="Make every message unique (defeats caches)")
+    parser.add_argument("--latency", default="const:0.2", help="const:S, uniform:LO:HI or lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="Streamed tokens per second; 0 = instant")
+    parser.add_argument("--reply-tokens", type=int, default=40)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of model calls that fail")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+    if args.transport is None:
+        args.transport = "http" if args.endpoint == "stream" else "inprocess"
+    elif args.transport == "inprocess" and args.endpoint == "stream":
+        parser.error("--endpoint stream needs --transport http: the in-process transport buffers the response")
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": asyncio.run(run(args)),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            if not compare(report, json.load(f), args.max_regression):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
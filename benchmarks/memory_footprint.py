@@ -0,0 +1,76 @@
+"""
+Memory footprint of session storage per 10k sessions.
+
+Compares the compact ring-buffer SessionMemory with the previous layout
+(a list of pydantic ChatMessage models with datetime timestamps).
+
+Run with: python -m benchmarks.memory_footprint --sessions 10000 --messages 20
+"""
+
+import argparse
+import gc
+import tracemalloc
+from datetime import datetime
+
+from app.models.schemas import ChatMessage
+from app.services.session_store import InMemorySessionStore
+
+
+def _measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    keep = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del keep
+    return size
+
+
+def _contents(messages: int) -> list:
+    # Distinct content strings, created up front so both layouts share them
+    return [f"message number {i} with some typical tutoring text" for i in range(messages)]
+
+
+def build_pydantic_lists(sessions: int, contents: list) -> dict:
+    return {
+        f"session-{i}": [
+            ChatMessage(role="user" if n % 2 == 0 else "assistant", content=content, timestamp=datetime.now())
+            for n, content in enumerate(contents)
+        ]
+        for i in range(sessions)
+    }
+
+
+def build_ring_buffers(sessions: int, contents: list) -> InMemorySessionStore:
+    store = InMemorySessionStore(max_sessions=sessions * 2, max_messages=len(contents))
+    for i in range(sessions):
+        store.append_messages(f"session-{i}", [
+            ("user" if n % 2 == 0 else "assistant", content) for n, content in enumerate(contents)
+        ])
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=20, help="Messages per session")
+    args = parser.parse_args()
+
+    contents = _contents(args.messages)
+    scale = 10000 / args.sessions
+    for name, build in (
+        ("pydantic_list", lambda: build_pydantic_lists(args.sessions, contents)),
+        ("ring_buffer", lambda: build_ring_buffers(args.sessions, contents)),
+    ):
+        size = _measure(build)
+        print({
+            "layout": name,
+            "sessions": args.sessions,
+            "messages_per_session": args.messages,
+            "mb_per_10k_sessions": round(size * scale / 1024 / 1024, 1),
+        })
+
+
+if __name__ == "__main__":
+    main()
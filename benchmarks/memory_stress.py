@@ -0,0 +1,79 @@
+"""
+Multithreaded stress test of the in-memory session store.
+
+Threads append user/assistant pairs to a shared set of sessions while reading their
+recent messages, then every session is checked for lost or interleaved messages.
+Throughput is reported per thread count.
+
+Run with: python -m benchmarks.memory_stress --threads 1 2 4 8 --shards 16
+"""
+
+import argparse
+import threading
+import time
+
+from app.services.session_store import InMemorySessionStore
+
+
+def run(threads: int, shards: int, sessions_per_thread: int, turns: int) -> dict:
+    total_turns = threads * turns
+    # Scale sessions with threads so per-session history size stays constant
+    sessions = threads * sessions_per_thread
+    store = InMemorySessionStore(
+        max_sessions=sessions,
+        max_messages=2 * total_turns,
+        num_shards=shards
+    )
+    barrier = threading.Barrier(threads)
+
+    def worker(worker_id: int) -> None:
+        barrier.wait()
+        for turn in range(turns):
+            session_id = f"session-{(worker_id + turn) % sessions}"
+            store.append_messages(session_id, [
+                ("user", f"{worker_id}:{turn}"),
+                ("assistant", f"{worker_id}:{turn}")
+            ])
+            store.get_messages(session_id, limit=10)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    stored = 0
+    for session_id in store.list_sessions():
+        messages = store.get_messages(session_id)
+        stored += len(messages)
+        for user, assistant in zip(messages[::2], messages[1::2]):
+            assert user.role == "user" and assistant.role == "assistant", "interleaved turn"
+            assert user.content == assistant.content, "interleaved turn"
+    assert stored == 2 * total_turns, f"lost messages: stored {stored}, expected {2 * total_turns}"
+
+    return {
+        "threads": threads,
+        "shards": shards,
+        "sessions": sessions,
+        "turns": total_turns,
+        "elapsed_s": round(elapsed, 3),
+        "turns_per_s": round(total_turns / elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--sessions-per-thread", type=int, default=16)
+    parser.add_argument("--turns", type=int, default=5000, help="Turns appended per thread")
+    args = parser.parse_args()
+
+    for threads in args.threads:
+        print(run(threads, args.shards, args.sessions_per_thread, args.turns))
+
+
+if __name__ == "__main__":
+    main()
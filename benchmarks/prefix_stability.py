@@ -0,0 +1,139 @@
+"""
+Prompt-prefix stability across the turns of one session.
+
+A recording stub model captures every agent prompt and plays a provider with
+implicit prefix caching: the tokens of the longest message-aligned prefix
+shared with the previous prompt are reported as cache reads in the reply's
+usage metadata. The script drives one long session, with rolling summaries
+folded in between turns, and counts the turns where context_start did not
+move but the prompt does not start with the byte-identical previous prompt,
+and the turns where context_start moved although the history since it fit
+the budget, or did not move although it overflowed. All three are zero for
+the stable window; tests/test_prompt_prefix.py checks that. The same run with
+the old sliding window (newest turns that fit the budget) is shown for
+comparison.
+
+Run with: python -m benchmarks.prefix_stability --turns 40 --budget 400
+"""
+
+import argparse
+import asyncio
+import json
+from typing import List
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import Field
+
+from app import config
+from app.services import agent_service
+from app.services.session_store import pack_stable_window
+from app.services.summary_service import SUMMARY_PROMPT
+from app.services.tokenizer import estimate_tokens
+from app.services.workflow_service import WorkflowService
+from benchmarks.fake_llm import FakeChatModel
+
+
+class RecordingLLM(FakeChatModel):
+    """FakeChatModel that records agent prompts and reports prefix-cache reads like a caching provider"""
+
+    latency: str = "const:0"
+    prompts: List[list] = Field(default_factory=list)
+    summaries: int = 0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if messages[0].content == SUMMARY_PROMPT:
+            self.summaries += 1
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f"Summary {self.summaries}"))])
+
+        encoded = [json.dumps({"type": message.type, "content": message.content}) for message in messages]
+        previous = self.prompts[-1] if self.prompts else []
+        shared = 0
+        while shared < min(len(previous), len(encoded)) and previous[shared] == encoded[shared]:
+            shared += 1
+        self.prompts.append(encoded)
+
+        input_tokens = sum(estimate_tokens(message.content) for message in messages)
+        cached = sum(estimate_tokens(message.content) for message in messages[:shared])
+        reply = f"Answer {len(self.prompts)}: " + "velocity is displacement over time. " * 8
+        message = AIMessage(content=reply, usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": estimate_tokens(reply),
+            "total_tokens": input_tokens + estimate_tokens(reply),
+            "input_token_details": {"cache_read": cached},
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def sliding_window(messages, token_budget, after_seq, refill_fraction):
+    """The old window: the newest messages that fit the budget, so its start moves every turn"""
+    kept = []
+    used = 0
+    for message in reversed(messages):
+        used += message.tokens
+        if used > token_budget:
+            break
+        kept.append(message)
+    kept.reverse()
+    return [{"role": message.role, "content": message.content} for message in kept], after_seq
+
+
+async def run(turns: int, budget: int, sliding: bool, summaries: bool = True) -> dict:
+    llm = RecordingLLM(course="Physics")
+    agent_service.get_llm = lambda *args, **kwargs: llm
+    agent_service.pack_stable_window = sliding_window if sliding else pack_stable_window
+    config.CONTEXT_TOKEN_BUDGET = budget
+    config.CONTEXT_TOKEN_BUDGETS = {}
+    workflow_service = WorkflowService()
+    service = workflow_service.agent_service
+    service.summary_service.enabled = summaries
+    session_id = "prefix-session"
+
+    context_start = 0
+    restarts = unstable_prefix = restarts_without_overflow = overflows_without_restart = 0
+    for turn in range(turns):
+        history = service.memory_service.store.get_messages_since(session_id, context_start) or []
+        overflowed = sum(message.tokens for message in history) > budget
+        await workflow_service.aprocess_message(f"What is velocity, part {turn}?", session_id)
+        # Let the background fold land before the next turn, as it would between a student's messages
+        await service.summary_service.wait_idle()
+        new_start = service.memory_service.get_metadata(session_id)["context_start"]
+        if turn:
+            restarted = new_start != context_start
+            restarts += restarted
+            restarts_without_overflow += restarted and not overflowed
+            overflows_without_restart += overflowed and not restarted
+            previous, current = "\n".join(llm.prompts[-2]), "\n".join(llm.prompts[-1])
+            unstable_prefix += not restarted and not current.startswith(previous)
+        context_start = new_start
+    workflow_service.shutdown()
+
+    stats = service.prompt_cache_stats.get_stats()["Physics"]
+    return {
+        "window": "sliding" if sliding else "stable",
+        "turns": turns,
+        "summaries_folded": llm.summaries,
+        # Distinct summaries the prompts carried; each is adopted when the window restarts
+        "summaries_adopted": len({prompt[0] for prompt in llm.prompts}) - 1,
+        "window_restarts": restarts,
+        # Turns where context_start stayed put but the previous prompt was not a byte-identical prefix
+        "unstable_prefix_turns": unstable_prefix,
+        "restarts_without_overflow": restarts_without_overflow,
+        "overflows_without_restart": overflows_without_restart,
+        "cached_ratio": round(stats["cached_ratio"], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--budget", type=int, default=400, help="History token budget per prompt")
+    parser.add_argument("--no-summaries", action="store_true", help="Do not fold older turns into a summary")
+    args = parser.parse_args()
+
+    for sliding in (False, True):
+        print(asyncio.run(run(args.turns, args.budget, sliding, summaries=not args.no_summaries)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Per-request overhead of the chat path, excluding network time.
+
+Measures three things with no provider round trip:
+  - building a chat model client (init_chat_model) versus the cached get_llm()
+  - binding the structured-output classifier per call versus the gateway's
+    cached runnable
+  - a full workflow run against a zero-latency stub model
+
+Building a real client needs no network, only an API key, so a dummy key is
+used when GOOGLE_API_KEY is unset.
+
+Run with: python -m benchmarks.request_overhead --iterations 200
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-dummy-key")
+
+from langchain.chat_models import init_chat_model
+
+from app import config
+from app.services import agent_service
+from app.services.course_registry import CourseRegistry
+from app.services.llm_gateway import LLMGateway
+from app.services.llm_service import get_llm
+from app.services.workflow_service import WorkflowService
+from benchmarks.fake_llm import FakeChatModel
+
+
+def _per_call_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return round((time.perf_counter() - start) / iterations * 1e6, 1)
+
+
+def client_and_binding(iterations: int) -> dict:
+    schema = CourseRegistry.from_file(config.COURSES_FILE).classifier_schema
+    llm = get_llm()
+    gateway = LLMGateway(get_llm)
+    gateway.bind(schema)
+    return {
+        "init_chat_model_us": _per_call_us(
+            lambda: init_chat_model("gemini-2.5-flash", model_provider="google_genai"), iterations
+        ),
+        "cached_get_llm_us": _per_call_us(get_llm, iterations),
+        "with_structured_output_us": _per_call_us(
+            lambda: llm.with_structured_output(schema), iterations
+        ),
+        "cached_bind_us": _per_call_us(lambda: gateway.bind(schema), iterations),
+    }
+
+
+async def workflow_overhead(iterations: int) -> dict:
+    llm = FakeChatModel(latency="const:0", course="Physics")
+    agent_service.get_llm = lambda *args, **kwargs: llm
+    workflow_service = WorkflowService()
+    # Unique messages so neither the classification cache nor coalescing short-circuits
+    await workflow_service.aprocess_message("warm up", "bench-warmup")
+    start = time.perf_counter()
+    for i in range(iterations):
+        await workflow_service.aprocess_message(f"Tell me something interesting #{i}", f"bench-{i}")
+    elapsed = time.perf_counter() - start
+    await workflow_service.agent_service.summary_service.wait_idle()
+    workflow_service.shutdown()
+    return {"workflow_per_request_us": round(elapsed / iterations * 1e6, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    print(client_and_binding(args.iterations))
+    print(asyncio.run(workflow_overhead(args.iterations)))
+
+
+if __name__ == "__main__":
+    main()
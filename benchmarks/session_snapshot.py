@@ -0,0 +1,128 @@
+"""
+Snapshot and warm-restart timings of the in-memory session store.
+
+Fills a store with sessions and measures:
+- writing the binary snapshot (and its size per message);
+- booting a new store from it, which decodes only the index;
+- the first access to a session, which decodes that one session;
+- a second snapshot after a small share of the sessions changed, where
+  sessions never accessed since the restart are copied as raw bytes;
+- decoding every session, i.e. what an eager load would cost up front.
+
+For reference, the same sessions are also written to and fully parsed from
+a JSON file, as an eager loader would. Restored sessions are checked against
+the originals.
+
+Run with: python -m benchmarks.session_snapshot --sessions 20000 --messages 20
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import tempfile
+import time
+
+from app.services.session_store import InMemorySessionStore
+from cli import percentile
+
+
+def _timed(action) -> tuple:
+    # Collect first so a full collection over the filled store is not charged to whichever step triggers it
+    gc.collect()
+    start = time.perf_counter()
+    result = action()
+    return result, round((time.perf_counter() - start) * 1000, 1)
+
+
+def fill(store: InMemorySessionStore, sessions: int, messages: int, seed: int) -> list:
+    rng = random.Random(seed)
+    words = [f"word{i}" for i in range(2000)]
+    session_ids = [f"session-{i:07d}" for i in range(sessions)]
+    for session_id in session_ids:
+        store.append_messages(session_id, [
+            ("user" if n % 2 == 0 else "assistant", " ".join(rng.choices(words, k=rng.randint(5, 60))))
+            for n in range(messages)
+        ])
+        store.update_metadata(session_id, {"last_course": "Physics", "context_start": 0})
+    return session_ids
+
+
+def json_roundtrip(store: InMemorySessionStore, session_ids: list, path: str) -> dict:
+    """Write every session to JSON and parse it all back, as an eager loader would"""
+    def dump():
+        data = {
+            session_id: [list(message) for message in store.find_session(session_id).messages]
+            for session_id in session_ids
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    def load():
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    _, write_ms = _timed(dump)
+    _, load_ms = _timed(load)
+    return {"write_ms": write_ms, "load_ms": load_ms, "file_mb": round(os.path.getsize(path) / 1024 / 1024, 1)}
+
+
+def run(sessions: int, messages: int, changed: float, seed: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sessions.snapshot")
+        config = {"max_sessions": sessions * 2, "max_messages": messages * 2, "snapshot_path": path}
+        original = InMemorySessionStore(**config)
+        session_ids = fill(original, sessions, messages, seed)
+
+        written, save_ms = _timed(original.save_snapshot)
+        size = os.path.getsize(path)
+
+        restored = InMemorySessionStore(**config)
+        registered, boot_ms = _timed(restored.load_snapshot)
+
+        rng = random.Random(seed)
+        sample = rng.sample(session_ids, min(1000, sessions))
+        first_access = []
+        for session_id in sample:
+            start = time.perf_counter()
+            session = restored.find_session(session_id)
+            first_access.append(time.perf_counter() - start)
+            assert list(session.messages) == list(original.find_session(session_id).messages)
+            assert session.metadata == original.find_session(session_id).metadata
+        first_access.sort()
+
+        for session_id in rng.sample(session_ids, int(sessions * changed)):
+            restored.append_messages(session_id, [("user", "one more question"), ("assistant", "one more answer")])
+        _, resave_ms = _timed(restored.save_snapshot)
+
+        _, decode_all_ms = _timed(lambda: [restored.find_session(session_id) for session_id in session_ids])
+
+        return {
+            "sessions": written,
+            "messages": sessions * messages,
+            "snapshot_mb": round(size / 1024 / 1024, 1),
+            "bytes_per_message": round(size / (sessions * messages), 1),
+            "save_ms": save_ms,
+            "boot_ms": boot_ms,
+            "registered": registered,
+            "first_access_p50_us": round(percentile(first_access, 0.50) * 1e6, 1),
+            "first_access_p99_us": round(percentile(first_access, 0.99) * 1e6, 1),
+            f"resave_after_{changed:.0%}_changed_ms": resave_ms,
+            "decode_all_ms": decode_all_ms,
+            "json_eager": json_roundtrip(original, session_ids, os.path.join(tmp, "sessions.json")),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--messages", type=int, default=20, help="Messages per session")
+    parser.add_argument("--changed", type=float, default=0.01, help="Share of sessions changed before the second snapshot")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run(args.sessions, args.messages, args.changed, args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Offline bulk processing of chat messages
+
+Streams a JSONL file of messages through the workflow with a bounded pool of
+async workers and appends one result per line to an output JSONL file. The
+output doubles as the checkpoint: re-running the same command skips every
+input line that already has a result, so an interrupted run resumes where it
+stopped. With --retry-errors, failed lines are run again and the newer record
+for a line supersedes the older one. Lines that share a session_id run one
+after another in file order, so each turn sees the ones before it; other lines
+run concurrently.
+
+Input lines:  {"message": "...", "session_id": "optional", "id": "optional"}
+Output lines: {"line": 3, "id": ..., "session_id": ..., "course": ..., "message": ...,
+               "error": null, "latency_ms": 812.4}
+
+Run with: python cli.py input.jsonl output.jsonl --workers 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict
+
+from app.log import configure_logging
+from app.services.workflow_service import WorkflowService
+from app.views.response_formatter import ResponseFormatter
+
+
+def load_checkpoint(output_path: str, retry_errors: bool) -> set:
+    """Collect the input line numbers that already have a result"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for raw in f:
+            try:
+                record = json.loads(raw)
+            except json.JSONDecodeError:
+                # A torn final line from an interrupted run; that item is redone
+                continue
+            if retry_errors and record.get("error"):
+                continue
+            done.add(record["line"])
+    return done
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+async def run(input_path: str, output_path: str, workers: int, retry_errors: bool) -> dict:
+    done = load_checkpoint(output_path, retry_errors)
+    workflow_service = WorkflowService()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    latencies = []
+    errors = 0
+    # Completion of the last line read for each session; the next line of that session waits for it
+    session_tails: Dict[str, asyncio.Future] = {}
+
+    with open(output_path, "a+", encoding="utf-8") as output:
+        # Terminate a torn final line so the next record starts on its own line
+        if output.tell() > 0:
+            output.seek(output.tell() - 1)
+            if output.read(1) != "\n":
+                output.write("\n")
+
+        async def worker() -> None:
+            nonlocal errors
+            while True:
+                item = await queue.get()
+                if item is None:
+                    queue.task_done()
+                    return
+                line_number, record, previous, finished = item
+                session_id = record.get("session_id")
+                if previous is not None:
+                    await previous
+                start = time.perf_counter()
+                result = {"line": line_number, "id": record.get("id"), "session_id": session_id}
+                try:
+                    state = await workflow_service.aprocess_message(record["message"], session_id)
+                    response = ResponseFormatter.format_chat_response(state, session_id)
+                    result.update(course=response.course, message=response.message, error=None)
+                except Exception as e:
+                    errors += 1
+                    result.update(course=None, message=None, error=str(e))
+                elapsed = time.perf_counter() - start
+                latencies.append(elapsed)
+                result["latency_ms"] = round(elapsed * 1000, 1)
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+                finished.set_result(None)
+                if session_tails.get(session_id) is finished:
+                    del session_tails[session_id]
+                queue.task_done()
+
+        pool = [asyncio.create_task(worker()) for _ in range(workers)]
+        start = time.perf_counter()
+        skipped = 0
+        with open(input_path, encoding="utf-8") as source:
+            for line_number, raw in enumerate(source):
+                if not raw.strip():
+                    continue
+                if line_number in done:
+                    skipped += 1
+                    continue
+                record = json.loads(raw)
+                session_id = record.get("session_id")
+                previous = session_tails.get(session_id) if session_id else None
+                finished = asyncio.get_running_loop().create_future()
+                if session_id:
+                    session_tails[session_id] = finished
+                await queue.put((line_number, record, previous, finished))
+        for _ in pool:
+            await queue.put(None)
+        await asyncio.gather(*pool)
+        elapsed = time.perf_counter() - start
+
+    await workflow_service.agent_service.summary_service.wait_idle()
+    workflow_service.shutdown()
+
+    latencies.sort()
+    return {
+        "processed": len(latencies),
+        "skipped": skipped,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "latency_p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file of messages")
+    parser.add_argument("output", help="JSONL file results are appended to (also the checkpoint)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent workflow runs")
+    parser.add_argument("--retry-errors", action="store_true", help="Re-run lines whose earlier result was an error")
+    args = parser.parse_args()
+
+    configure_logging()
+    report = asyncio.run(run(args.input, args.output, args.workers, args.retry_errors))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
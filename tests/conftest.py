@@ -0,0 +1,32 @@
+"""Shared fixtures: every model call goes to the offline FakeChatModel"""
+import pytest
+
+from app.services import agent_service
+from benchmarks.fake_llm import FakeChatModel
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """Route get_llm() to a FakeChatModel that answers instantly and classifies everything as Physics"""
+    model = FakeChatModel(latency="const:0", course="Physics")
+    monkeypatch.setattr(agent_service, "get_llm", lambda *args, **kwargs: model)
+    return model
+
+
+@pytest.fixture
+def workflow(fake_model):
+    from app.services.workflow_service import WorkflowService
+    return WorkflowService()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Test client for the app; the controller builds its services on import, so get_llm is patched first"""
+    from fastapi.testclient import TestClient
+
+    model = FakeChatModel(latency="const:0", course="Physics")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(agent_service, "get_llm", lambda *args, **kwargs: model)
+        from app.main import app
+        with TestClient(app) as test_client:
+            yield test_client
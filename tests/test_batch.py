@@ -0,0 +1,47 @@
+"""Tests for batch processing through /chat/batch and the bulk CLI"""
+import asyncio
+import json
+
+import pytest
+
+import cli
+from app.services import agent_service
+from benchmarks.fake_llm import FakeChatModel
+
+
+@pytest.fixture
+def jittery_model(monkeypatch):
+    """A model whose latency varies per call, so concurrent runs finish out of order"""
+    model = FakeChatModel(latency="uniform:0.001:0.03", course="Physics")
+    monkeypatch.setattr(agent_service, "get_llm", lambda *args, **kwargs: model)
+    return model
+
+
+def test_batch_items_of_one_session_run_in_order(jittery_model):
+    from app.services.workflow_service import WorkflowService
+
+    workflow = WorkflowService()
+    items = [(f"What is force number {i}?", "shared" if i % 2 else None) for i in range(10)]
+    results = asyncio.run(workflow.aprocess_batch(items, concurrency=4))
+
+    assert not [result for result in results if isinstance(result, Exception)]
+    stored = workflow.agent_service.memory_service.store.get_messages("shared")
+    assert [msg.content for msg in stored if msg.role == "user"] == [message for message, session in items if session]
+    # The last turn was run with every earlier turn of its session in its history
+    assert len(results[-1]["messages"]) == 10
+
+
+def test_cli_runs_lines_of_one_session_in_file_order(jittery_model, tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    with open(source, "w", encoding="utf-8") as f:
+        for i in range(24):
+            f.write(json.dumps({"id": i, "message": f"What is force number {i}?", "session_id": f"s{i % 3}"}) + "\n")
+
+    report = asyncio.run(cli.run(str(source), str(output), workers=8, retry_errors=False))
+
+    assert (report["processed"], report["errors"]) == (24, 0)
+    with open(output, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    for session_id in ("s0", "s1", "s2"):
+        ids = [record["id"] for record in records if record["session_id"] == session_id]
+        assert ids == sorted(ids)
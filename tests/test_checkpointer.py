@@ -0,0 +1,94 @@
+"""Tests for the session checkpointer's round trip through the session store"""
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+
+from app.services.checkpointer import SessionCheckpointer, message_seq
+from app.services.session_store import InMemorySessionStore
+
+
+def thread(session_id: str) -> dict:
+    return {"configurable": {"thread_id": session_id}}
+
+
+def test_get_tuple_of_unknown_session_is_none():
+    assert SessionCheckpointer(InMemorySessionStore()).get_tuple(thread("missing")) is None
+
+
+def test_round_trip_keeps_summary_and_context_start():
+    store = InMemorySessionStore()
+    checkpointer = SessionCheckpointer(store)
+    store.append_messages("s", [("user", f"q{i}") if i % 2 == 0 else ("assistant", f"a{i}") for i in range(8)])
+    store.update_metadata("s", {
+        "summary": "Earlier the user asked about forces.",
+        "summary_upto": 2,
+        "context_start": 4,
+        "last_course": "Physics",
+        "window_summary": "The user asked about forces."
+    })
+
+    loaded = checkpointer.get_tuple(thread("s"))
+    values = loaded.checkpoint["channel_values"]
+    # Messages before the context window start are not loaded
+    assert [message_seq(message) for message in values["messages"]] == [4, 5, 6, 7]
+    assert values["summary"] == "Earlier the user asked about forces."
+    assert values["summary_upto"] == 2
+    assert values["window_summary"] == "The user asked about forces."
+    assert values["context_start"] == 4
+    assert values["course"] == "Physics"
+    assert values["messages"][1].response_metadata["tokens"] == store.get_messages("s")[5].tokens
+
+    # Save the next turn the way the graph does: the loaded messages plus the new ones
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {
+        **values,
+        "messages": [*values["messages"], HumanMessage(content="q8"), AIMessage(content="a9")],
+        "course": "English",
+        "context_start": 6,
+        "window_summary": "Earlier the user asked about forces."
+    }
+    config = checkpointer.put(loaded.config, checkpoint, {}, {})
+    assert config["configurable"]["thread_id"] == "s"
+
+    assert [msg.content for msg in store.get_messages("s", limit=3)] == ["a7", "q8", "a9"]
+    assert store.get_metadata("s") == {
+        "summary": "Earlier the user asked about forces.",
+        "summary_upto": 2,
+        "context_start": 6,
+        "last_course": "English",
+        "window_summary": "Earlier the user asked about forces."
+    }
+
+    reloaded = checkpointer.get_tuple(thread("s")).checkpoint["channel_values"]
+    assert [message_seq(message) for message in reloaded["messages"]] == [6, 7, 8, 9]
+    assert reloaded["course"] == "English"
+
+
+def test_incomplete_turn_is_not_saved():
+    store = InMemorySessionStore()
+    checkpointer = SessionCheckpointer(store)
+    store.append_messages("s", [("user", "q0"), ("assistant", "a1")])
+    values = checkpointer.get_tuple(thread("s")).checkpoint["channel_values"]
+
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {**values, "messages": [*values["messages"], HumanMessage(content="q2")]}
+    checkpointer.put(thread("s"), checkpoint, {}, {})
+
+    assert [msg.content for msg in store.get_messages("s")] == ["q0", "a1"]
+
+
+def test_workflow_turns_are_saved_and_reloaded(workflow):
+    async def conversation():
+        await workflow.aprocess_message("What is Newton's first law?", "s")
+        return await workflow.aprocess_message("What is Newton's second law?", "s")
+
+    result = asyncio.run(conversation())
+
+    # The second turn saw the first one, loaded from the store
+    assert [message.content for message in result["messages"][::2]] == [
+        "What is Newton's first law?", "What is Newton's second law?"
+    ]
+    store = workflow.agent_service.memory_service.store
+    assert [msg.role for msg in store.get_messages("s")] == ["user", "assistant", "user", "assistant"]
+    assert store.get_metadata("s")["last_course"] == "Physics"
@@ -0,0 +1,170 @@
+"""Tests for the LLM gateway"""
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+from prometheus_client import REGISTRY
+
+from app.services.llm_gateway import (
+    CallPolicy, GatewaySaturatedError, LLMGateway, ModelTimeoutError, RateLimitedError
+)
+from benchmarks.fake_llm import FakeChatModel, FakeProviderError
+
+
+class FlakyChatModel(FakeChatModel):
+    """FakeChatModel whose first `failures` calls raise, streamed calls after their first token"""
+
+    failures: int = 0
+    error: type = FakeProviderError
+    calls: int = 0
+
+    def _fail_first_calls(self) -> None:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error("injected failure")
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self._fail_first_calls()
+        return await super()._agenerate(messages, stop, run_manager, **kwargs)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        yield ChatGenerationChunk(message=AIMessageChunk(content="partial "))
+        self._fail_first_calls()
+        async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+            yield chunk
+
+
+def gateway_for(model: FakeChatModel, policy: CallPolicy = CallPolicy(), **kwargs) -> LLMGateway:
+    return LLMGateway(lambda *args: model, call_policies={"default": policy}, **kwargs)
+
+
+def ask(text: str) -> list:
+    return [{"role": "user", "content": text}]
+
+
+def test_transient_errors_are_retried():
+    model = FlakyChatModel(latency="const:0", failures=2)
+    gateway = gateway_for(model, CallPolicy(max_retries=2, backoff_base_seconds=0))
+
+    reply = asyncio.run(gateway.ainvoke(ask("What is a force?")))
+
+    assert reply.content
+    assert model.calls == 3
+    assert gateway.get_stats()["retries"] == 2
+
+
+def test_retries_stop_at_max_retries():
+    model = FlakyChatModel(latency="const:0", failures=5)
+    gateway = gateway_for(model, CallPolicy(max_retries=1, backoff_base_seconds=0))
+
+    with pytest.raises(FakeProviderError):
+        asyncio.run(gateway.ainvoke(ask("What is a force?")))
+    assert model.calls == 2
+
+
+def test_permanent_errors_are_not_retried():
+    model = FlakyChatModel(latency="const:0", failures=1, error=ValueError)
+    gateway = gateway_for(model, CallPolicy(max_retries=2, backoff_base_seconds=0))
+
+    with pytest.raises(ValueError):
+        asyncio.run(gateway.ainvoke(ask("What is a force?")))
+    assert model.calls == 1
+
+
+def test_slow_calls_time_out_after_every_attempt():
+    model = FakeChatModel(latency="const:1")
+    gateway = gateway_for(model, CallPolicy(timeout_seconds=0.05, max_retries=1, backoff_base_seconds=0))
+
+    with pytest.raises(ModelTimeoutError):
+        asyncio.run(gateway.ainvoke(ask("What is a force?")))
+    assert gateway.get_stats()["timeouts"] == 2
+
+
+def test_calls_beyond_the_queue_are_rejected():
+    model = FakeChatModel(latency="const:0.2")
+    gateway = gateway_for(model, max_concurrency=1, max_queue=1)
+
+    async def flood():
+        running = asyncio.create_task(gateway.ainvoke(ask("first")))
+        await asyncio.sleep(0.05)
+        queued = asyncio.create_task(gateway.ainvoke(ask("second")))
+        await asyncio.sleep(0.05)
+        assert REGISTRY.get_sample_value("chat_llm_queue_depth") == 1
+        assert REGISTRY.get_sample_value("chat_llm_in_flight") == 1
+        with pytest.raises(GatewaySaturatedError):
+            await gateway.ainvoke(ask("third"))
+        # Identical prompts join the call in flight instead of queueing
+        joined = await gateway.ainvoke(ask("second"))
+        return await running, await queued, joined
+
+    first, second, joined = asyncio.run(flood())
+    assert first.content and second.content == joined.content
+    stats = gateway.get_stats()
+    assert (stats["rejected"], stats["coalesced"], stats["calls"]) == (1, 1, 2)
+
+
+def test_streamed_answers_are_not_coalesced(monkeypatch):
+    from app.services import agent_service
+    from app.services.workflow_service import WorkflowService
+
+    monkeypatch.setattr(
+        agent_service, "get_llm", lambda *args, **kwargs: FakeChatModel(latency="const:0.1", course="Physics")
+    )
+    workflow = WorkflowService()
+
+    async def stream(session_id: str) -> list:
+        return [
+            event["event"] async for event in workflow.astream_message("What is velocity?", session_id)
+        ]
+
+    async def both():
+        return await asyncio.gather(stream("a"), stream("b"))
+
+    for events in asyncio.run(both()):
+        assert events.count("token") == 40
+        assert events[-1] == "done"
+    assert workflow.agent_service.gateway.get_stats()["coalesced"] == 0
+
+
+def test_calls_that_would_wait_too_long_for_the_rate_limit_are_rejected():
+    gateway = gateway_for(
+        FakeChatModel(latency="const:0"), rate_per_second=1, burst=1, max_rate_wait_seconds=0.1
+    )
+
+    async def burst():
+        await gateway.ainvoke(ask("first"))
+        with pytest.raises(RateLimitedError):
+            await gateway.ainvoke(ask("second"))
+
+    asyncio.run(burst())
+    assert gateway.get_stats()["rate_limited"] == 1
+
+
+def test_streamed_answer_is_not_retried_after_its_first_token(monkeypatch):
+    from app.services import agent_service
+    from app.services.workflow_service import WorkflowService
+
+    model = FlakyChatModel(latency="const:0", course="Physics", failures=1)
+    monkeypatch.setattr(agent_service, "get_llm", lambda *args, **kwargs: model)
+    workflow = WorkflowService()
+    tokens = []
+
+    async def stream():
+        async for event in workflow.astream_message("What is Newton's second law?", "s"):
+            if event["event"] == "token":
+                tokens.append(event["data"]["content"])
+
+    with pytest.raises(FakeProviderError):
+        asyncio.run(stream())
+    # A retry would have sent "partial " a second time
+    assert tokens == ["partial "]
+    assert model.calls == 1
+    # Nothing of the failed turn is saved
+    assert workflow.agent_service.memory_service.store.get_messages("s") == []
+
+    # The same failure before any output is retried
+    model.calls = 0
+    result = asyncio.run(workflow.aprocess_message("What is Newton's first law?", "s"))
+    assert model.calls == 2
+    assert result["messages"][-1].content
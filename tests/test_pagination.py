@@ -0,0 +1,84 @@
+"""Tests for session and history cursors, and history ETags"""
+import pytest
+
+from app.services.session_store import create_session_store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    store = create_session_store(request.param, path=str(tmp_path / "sessions.db"), num_shards=4)
+    yield store
+    store.close()
+
+
+def test_session_listing_pages_forward_and_back(store):
+    for session_id in ["e", "a", "d", "b", "c"]:
+        store.append_messages(session_id, [("user", "hi")])
+
+    assert store.list_sessions_page(2) == (["d", "e"], True)
+    assert store.list_sessions_page(2, after="b") == (["c", "d"], True)
+    assert store.list_sessions_page(2, after="d") == (["e"], False)
+    assert store.list_sessions_page(2, before="c") == (["a", "b"], False)
+    assert store.list_sessions_page(10, after="a", before="e") == (["b", "c", "d"], False)
+
+
+def test_history_pages_by_sequence_number(store):
+    store.append_messages("s", [("user", f"m{i}") for i in range(6)])
+
+    newest = store.get_history("s", limit=2)
+    assert [msg.seq for msg in newest.messages] == [4, 5]
+    assert (newest.total, newest.has_more) == (6, True)
+
+    older = store.get_history("s", limit=2, before=4)
+    assert [msg.seq for msg in older.messages] == [2, 3]
+    assert older.has_more
+
+    forward = store.get_history("s", limit=2, after=1)
+    assert [msg.seq for msg in forward.messages] == [2, 3]
+    assert forward.has_more
+
+    tail = store.get_history("s", limit=10, after=3)
+    assert [msg.seq for msg in tail.messages] == [4, 5]
+    assert not tail.has_more
+
+
+def test_history_endpoint_pages_and_answers_304_until_changed(client):
+    session_id = "pagination-etag"
+    for question in ["What is velocity?", "What is acceleration?", "What is momentum?"]:
+        response = client.post("/chat", json={"message": question, "session_id": session_id})
+        assert response.status_code == 200
+
+    page = client.get(f"/sessions/{session_id}/history", params={"limit": 2})
+    assert page.status_code == 200
+    body = page.json()
+    assert [msg["seq"] for msg in body["messages"]] == [4, 5]
+    assert (body["total_messages"], body["has_more"]) == (6, True)
+
+    previous = client.get(f"/sessions/{session_id}/history", params={"limit": 2, "before": 4}).json()
+    assert [msg["seq"] for msg in previous["messages"]] == [2, 3]
+    assert [msg["role"] for msg in previous["messages"]] == ["user", "assistant"]
+
+    etag = page.headers["ETag"]
+    unchanged = client.get(
+        f"/sessions/{session_id}/history", params={"limit": 2}, headers={"If-None-Match": etag}
+    )
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == etag
+    # Another page of the same history has its own ETag
+    other_page = client.get(
+        f"/sessions/{session_id}/history", params={"limit": 3}, headers={"If-None-Match": etag}
+    )
+    assert other_page.status_code == 200
+
+    client.post("/chat", json={"message": "What is inertia?", "session_id": session_id})
+    changed = client.get(
+        f"/sessions/{session_id}/history", params={"limit": 2}, headers={"If-None-Match": etag}
+    )
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert [msg["seq"] for msg in changed.json()["messages"]] == [6, 7]
+
+
+def test_history_of_unknown_session_is_404(client):
+    response = client.get("/sessions/no-such-session/history", headers={"If-None-Match": "*"})
+    assert response.status_code == 404
@@ -0,0 +1,60 @@
+"""Tests for prompt prefixes staying byte-identical between context window restarts"""
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app import config
+from app.services import agent_service
+from benchmarks import prefix_stability
+
+
+def history(count: int, tokens_per_message: int) -> list:
+    """Loaded messages seq 0..count-1 followed by the new question"""
+    messages = [
+        (HumanMessage if seq % 2 == 0 else AIMessage)(
+            content=f"message {seq}", id=f"seq-{seq}", response_metadata={"tokens": tokens_per_message}
+        )
+        for seq in range(count)
+    ]
+    return [*messages, HumanMessage(content="new question")]
+
+
+def test_window_keeps_its_summary_until_it_restarts(workflow, monkeypatch):
+    monkeypatch.setattr(config, "CONTEXT_TOKEN_BUDGETS", {})
+    monkeypatch.setattr(config, "CONTEXT_TOKEN_BUDGET", 100)
+    agents = workflow.agent_service
+    state = {
+        "messages": history(8, 10),
+        "context_start": 0,
+        "summary": "newer summary",
+        "summary_upto": 4,
+        "window_summary": "older summary"
+    }
+
+    # 80 tokens fit the budget: the window and its summary stay as they were, though a newer summary exists
+    window, start, summary = agents._get_context(state, "Physics")
+    assert (len(window), start, summary) == (8, 0, "older summary")
+
+    # 120 tokens overflow it: the window restarts with the newer summary and without the messages it covers
+    state["messages"] = history(12, 10)
+    window, start, summary = agents._get_context(state, "Physics")
+    assert start >= 4
+    assert window[0]["content"] == f"message {start}"
+    assert summary == "newer summary"
+
+
+def test_prompt_prefix_is_stable_with_summaries(monkeypatch):
+    # run() patches these module globals; register them so they are restored afterwards
+    monkeypatch.setattr(agent_service, "get_llm", agent_service.get_llm)
+    monkeypatch.setattr(agent_service, "pack_stable_window", agent_service.pack_stable_window)
+    monkeypatch.setattr(config, "CONTEXT_TOKEN_BUDGET", config.CONTEXT_TOKEN_BUDGET)
+    monkeypatch.setattr(config, "CONTEXT_TOKEN_BUDGETS", config.CONTEXT_TOKEN_BUDGETS)
+
+    report = asyncio.run(prefix_stability.run(turns=40, budget=400, sliding=False, summaries=True))
+
+    # The run must exercise both restarts and summary folds for the checks to mean anything
+    assert report["window_restarts"] > 0
+    assert report["summaries_adopted"] > 0
+    assert report["unstable_prefix_turns"] == 0
+    assert report["restarts_without_overflow"] == 0
+    assert report["overflows_without_restart"] == 0
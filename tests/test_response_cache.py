@@ -0,0 +1,58 @@
+"""Tests for the response cache of context-free answers"""
+import pytest
+
+from app.services.cache_service import ResponseCache
+
+
+@pytest.fixture
+def cache():
+    cache = ResponseCache(enabled=True, max_entries_per_course=2)
+    cache.put("Programming", "What is a pointer in C?", "pointer answer")
+    return cache
+
+
+@pytest.mark.parametrize("question", [
+    "What is a pointer in C?",
+    "What's a pointer in C",
+    "what’s a POINTER in c??",
+    "Explain: what is a pointer in C",
+])
+def test_rephrased_questions_hit(cache, question):
+    assert cache.get("Programming", question) == "pointer answer"
+
+
+@pytest.mark.parametrize("question", [
+    "What is a pointer in C++?",
+    "What isn't a pointer in C?",
+    "What is a pointer in Go?",
+    "What is a C pointer?",
+])
+def test_different_questions_miss(cache, question):
+    assert cache.get("Programming", question) is None
+
+
+def test_numbers_must_match():
+    cache = ResponseCache(enabled=True)
+    cache.put("Physics", "A ball is thrown at 20 m/s. How high does it go?", "20 m/s answer")
+    assert cache.get("Physics", "A ball is thrown at 30 m/s. How high does it go?") is None
+    assert cache.get("Physics", "a ball is thrown at 20 m/s, how high does it go") == "20 m/s answer"
+
+
+def test_courses_are_separate_and_least_recently_used_is_evicted(cache):
+    assert cache.get("Physics", "What is a pointer in C?") is None
+
+    cache.put("Programming", "What is a struct in C?", "struct answer")
+    cache.get("Programming", "What is a pointer in C?")
+    cache.put("Programming", "What is a union in C?", "union answer")
+
+    assert cache.get("Programming", "What is a struct in C?") is None
+    assert cache.get("Programming", "What is a pointer in C?") == "pointer answer"
+    assert cache.invalidate("Programming") == 2
+    assert cache.get("Programming", "What is a union in C?") is None
+
+
+def test_questions_of_only_stopwords_are_not_cached():
+    cache = ResponseCache(enabled=True)
+    cache.put("Physics", "What is it?", "vague answer")
+    assert cache.get_stats()["courses"] == {}
+    assert cache.get("Physics", "What is it?") is None
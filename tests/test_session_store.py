@@ -0,0 +1,157 @@
+"""Tests for the session store backends"""
+import threading
+
+import pytest
+
+from app.services.session_store import InMemorySessionStore, create_session_store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    """Build a store of the parametrized backend"""
+    stores = []
+
+    def make(**kwargs):
+        store = create_session_store(request.param, path=str(tmp_path / "sessions.db"), **kwargs)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.close()
+
+
+def age_session(store, session_id: str, seconds: float) -> None:
+    """Move a session's last access back in time"""
+    if isinstance(store, InMemorySessionStore):
+        store.find_session(session_id).last_accessed -= seconds
+    else:
+        with store._connection() as conn:
+            conn.execute(
+                "UPDATE sessions SET last_accessed = last_accessed - ? WHERE session_id = ?",
+                (seconds, session_id)
+            )
+
+
+def test_reads_do_not_create_sessions(make_store):
+    store = make_store()
+    assert store.get_messages("missing") == []
+    assert store.get_history("missing") is None
+    assert store.get_metadata("missing") == {}
+    assert store.count_sessions() == 0
+
+
+def test_least_recently_used_session_is_evicted_at_capacity(make_store):
+    store = make_store(max_sessions=2)
+    store.append_messages("a", [("user", "first")])
+    store.append_messages("b", [("user", "second")])
+    age_session(store, "a", 2)
+    age_session(store, "b", 1)
+    # Touching "a" makes "b" the least recently used
+    store.append_messages("a", [("assistant", "reply")])
+    store.append_messages("c", [("user", "third")])
+    # The SQLite backend enforces capacity in the sweeper rather than on insert
+    store.cleanup_expired()
+
+    assert sorted(store.list_sessions()) == ["a", "c"]
+    assert store.count_sessions() == 2
+    assert store.get_history("b") is None
+    assert [msg.content for msg in store.get_messages("a")] == ["first", "reply"]
+
+
+def test_capacity_is_enforced_across_shards():
+    store = InMemorySessionStore(max_sessions=100, num_shards=16)
+    for i in range(150):
+        store.append_messages(f"s{i:03}", [("user", "hi")])
+
+    # However the IDs hash across shards, exactly the 100 most recent sessions remain
+    assert store.count_sessions() == 100
+    assert sorted(store.list_sessions()) == [f"s{i:03}" for i in range(50, 150)]
+
+
+def test_snapshot_restores_only_the_newest_sessions_that_fit(tmp_path):
+    path = str(tmp_path / "sessions.snapshot")
+    store = InMemorySessionStore(max_sessions=10, snapshot_path=path)
+    for i in range(10):
+        store.append_messages(f"s{i}", [("user", "hi")])
+    store.save_snapshot()
+    store.close()
+
+    restored = InMemorySessionStore(max_sessions=4, snapshot_path=path)
+    assert restored.load_snapshot() == 4
+    assert sorted(restored.list_sessions()) == ["s6", "s7", "s8", "s9"]
+    restored.close()
+
+
+def test_expired_sessions_are_removed_by_cleanup(make_store):
+    store = make_store(session_ttl_hours=1)
+    store.append_messages("stale", [("user", "old")])
+    store.append_messages("fresh", [("user", "new")])
+    age_session(store, "stale", 2 * 3600)
+
+    assert store.get_session_stats("stale")["is_expired"]
+    store.cleanup_expired()
+
+    assert store.list_sessions() == ["fresh"]
+    assert store.count_sessions() == 1
+    assert store.get_history("stale") is None
+
+
+def test_reads_that_touch_a_session_keep_expiry_in_order(make_store):
+    store = make_store(session_ttl_hours=1)
+    store.append_messages("a", [("user", "first")])
+    store.append_messages("b", [("user", "second")])
+    age_session(store, "a", 2 * 3600)
+    age_session(store, "b", 2 * 3600)
+
+    # Loading a session for a turn marks it used, so "b" is now the only expired session
+    store.get_messages_since("a", 0)
+    store.cleanup_expired()
+
+    assert store.list_sessions() == ["a"]
+
+
+def test_ring_buffer_keeps_the_newest_messages(make_store):
+    store = make_store(max_messages=4)
+    for i in range(3):
+        store.append_messages("s", [("user", f"q{i}"), ("assistant", f"a{i}")])
+
+    messages = store.get_messages("s")
+    assert [msg.content for msg in messages] == ["q1", "a1", "q2", "a2"]
+    # Sequence numbers keep counting past the dropped messages
+    assert [msg.seq for msg in messages] == [2, 3, 4, 5]
+    assert store.get_history("s").total == 4
+    assert [msg.seq for msg in store.get_messages_since("s", 4)] == [4, 5]
+
+
+def test_concurrent_turns_stay_contiguous(make_store):
+    store = make_store(max_messages=1000)
+    threads, turns = 8, 25
+
+    def worker(n: int) -> None:
+        for i in range(turns):
+            store.append_messages("shared", [("user", f"{n}:{i}"), ("assistant", f"{n}:{i}")])
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    messages = store.get_messages("shared")
+    assert len(messages) == threads * turns * 2
+    assert [msg.seq for msg in messages] == list(range(len(messages)))
+    for question, answer in zip(messages[::2], messages[1::2]):
+        assert (question.role, answer.role) == ("user", "assistant")
+        assert question.content == answer.content
+
+
+def test_eviction_keeps_the_listing_index_in_step():
+    store = InMemorySessionStore(max_sessions=3, num_shards=1)
+    for session_id in ["d", "a", "c", "b"]:
+        store.append_messages(session_id, [("user", "hi")])
+
+    # "d" was evicted; the sorted index used for paging must not still list it
+    assert store.list_sessions_page(10) == (["a", "b", "c"], False)
+    store.delete_session("b")
+    assert store.list_sessions_page(10) == (["a", "c"], False)
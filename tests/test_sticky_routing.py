@@ -0,0 +1,68 @@
+"""Tests for routing follow-ups to the session's previous course"""
+import pytest
+
+from app import config
+from app.services.classifier_service import LocalClassifier
+
+FOLLOW_UPS = [
+    "Why?",
+    "and then?",
+    "Can you explain that again?",
+    "Give me another example",
+    "Tell me more",
+    "ok, what does that mean?",
+    "Could you say it more simply please?",
+]
+
+NEW_QUESTIONS = [
+    "Why is the sky blue?",
+    "What is the capital of France and Spain?",
+    "Is it raining in Paris today?",
+    "Explain photosynthesis",
+    "And what about verbs in French?",
+    "Give me an example of a metaphor",
+    "How do I declare a variable in C?",
+]
+
+
+@pytest.fixture
+def classifier():
+    return LocalClassifier(enabled=False, follow_up_max_words=12)
+
+
+@pytest.mark.parametrize("text", FOLLOW_UPS)
+def test_follow_ups_are_detected(classifier, text):
+    assert classifier.is_follow_up(text)
+
+
+@pytest.mark.parametrize("text", NEW_QUESTIONS)
+def test_new_questions_are_not_follow_ups(classifier, text):
+    assert not classifier.is_follow_up(text)
+
+
+def test_long_messages_are_not_follow_ups():
+    text = "Can you explain that again, a little more simply, step by step please?"
+    assert not LocalClassifier(enabled=False, follow_up_max_words=12).is_follow_up(text)
+    assert LocalClassifier(enabled=False, follow_up_max_words=20).is_follow_up(text)
+
+
+def test_follow_ups_are_classified_afresh_when_disabled(workflow, monkeypatch):
+    monkeypatch.setattr(config, "SESSION_STICKY_ROUTING", False)
+    agents = workflow.agent_service
+    agents._classify_without_llm("Why?", "Physics")
+    assert agents.local_classifier.get_stats()["sticky_hits"] == 0
+
+
+def test_only_follow_ups_keep_the_previous_course(workflow, monkeypatch):
+    monkeypatch.setattr(config, "SESSION_STICKY_ROUTING", True)
+    agents = workflow.agent_service
+
+    for text in NEW_QUESTIONS:
+        agents._classify_without_llm(text, "Physics")
+    assert agents.local_classifier.get_stats()["sticky_hits"] == 0
+
+    assert agents._classify_without_llm("Why?", "Physics") == "Physics"
+    assert agents.local_classifier.get_stats()["sticky_hits"] == 1
+    # A session last answered by the fallback agent has no topic to stick to
+    agents._classify_without_llm("Why?", agents.courses.fallback.name)
+    assert agents.local_classifier.get_stats()["sticky_hits"] == 1